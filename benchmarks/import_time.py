@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark the time it takes to import the polyglot modules.
+
+Usage:
+  python benchmarks/import_time.py [--repeat N] [module ...]
+
+Every import runs in a fresh interpreter. The best time of the repeats is
+reported, along with the heavy dependencies the import pulled in.
+"""
+
+from __future__ import print_function
+from argparse import ArgumentParser
+import json
+import subprocess
+import sys
+
+
+MODULES = ["polyglot", "polyglot.text", "polyglot.__main__", "polyglot.load",
+           "polyglot.tokenize", "polyglot.detect"]
+
+HEAVY = ["icu", "pycld2", "morfessor", "polyglot.downloader",
+         "concurrent.futures.process"]
+
+PROBE = """
+import json, sys, time
+start = time.time()
+import {module}
+seconds = time.time() - start
+print(json.dumps([seconds, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def import_time(module):
+  """Return the seconds and the heavy modules of importing `module`."""
+  code = PROBE.format(module=module, heavy=HEAVY)
+  output = subprocess.check_output([sys.executable, "-c", code])
+  return json.loads(output.decode("utf-8").splitlines()[-1])
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("modules", nargs="*", default=MODULES)
+  parser.add_argument("--repeat", type=int, default=5,
+                      help="number of fresh interpreters per module.")
+  args = parser.parse_args()
+
+  print(u"{:<20}{:>10}  {}".format("module", "ms", "heavy dependencies"))
+  for module in args.modules:
+    runs = [import_time(module) for _ in range(args.repeat)]
+    best = min(seconds for seconds, _ in runs)
+    print(u"{:<20}{:>10.1f}  {}".format(module, 1000 * best,
+                                         u", ".join(runs[0][1]) or u"-"))
+
+
+if __name__ == "__main__":
+  main()
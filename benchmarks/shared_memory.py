@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the memory of forked workers serving the same embeddings.
+
+Usage:
+  python benchmarks/shared_memory.py [--words N] [--dim N] [--workers N]
+
+Workers answer nearest neighbour queries over a normalized random embedding
+that is either loaded by the parent before forking or by every worker after
+it. With private arrays the workers that load the embedding themselves hold
+a copy each. With shared arrays they map the file the first load wrote and
+share its pages. The vocabulary is a dictionary of Python objects and stays
+private to every process that builds it. Workers report their resident (RSS), proportional (PSS) and
+private memory from /proc/self/smaps_rollup at the same time, so this
+benchmark runs on Linux only.
+"""
+
+from __future__ import print_function
+from argparse import ArgumentParser
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from polyglot.mapping import Embedding, OrderedVocabulary
+from polyglot.utils import SharedArrays
+
+
+def memory():
+  """Return the RSS, PSS and private memory of this process in MiB."""
+  fields = {}
+  with open("/proc/self/smaps_rollup") as fh:
+    for line in fh:
+      parts = line.split()
+      if len(parts) == 3 and parts[2] == "kB":
+        fields[parts[0].rstrip(":")] = int(parts[1]) / 1024.
+  private = fields["Private_Clean"] + fields["Private_Dirty"]
+  return fields["Rss"], fields["Pss"], private
+
+
+def serve(embedding, queries):
+  """The work of a worker: look words up and rank their neighbours."""
+  for word in queries:
+    embedding.nearest_neighbors(word, top_k=5)
+
+
+def run(load, workers, queries, before_fork):
+  """Fork `workers` processes serving the embedding `load` returns.
+
+  Returns:
+    the average RSS, PSS and private memory of the workers.
+  """
+  embedding = load() if before_fork else None
+  children = []
+  for _ in range(workers):
+    to_parent, to_child = os.pipe(), os.pipe()
+    pid = os.fork()
+    if pid == 0:
+      if not before_fork:
+        embedding = load()
+      serve(embedding, queries)
+      os.write(to_parent[1], b"served")
+      os.read(to_child[0], 1)
+      os.write(to_parent[1], " ".join(str(x) for x in memory()).encode("ascii"))
+      os._exit(0)
+    children.append((pid, to_parent[0], to_child[1]))
+  for _, read, _ in children:
+    os.read(read, len(b"served"))
+  for _, _, write in children:
+    os.write(write, b"m")
+  results = [[float(x) for x in os.read(read, 1024).split()]
+             for _, read, _ in children]
+  for pid, read, write in children:
+    os.close(read)
+    os.close(write)
+    os.waitpid(pid, 0)
+  return np.mean(results, axis=0)
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--words", type=int, default=200000)
+  parser.add_argument("--dim", type=int, default=64)
+  parser.add_argument("--workers", type=int, default=4)
+  args = parser.parse_args()
+
+  words = [u"w{}".format(i) for i in range(args.words)]
+  queries = words[:20]
+  matrix_mib = args.words * args.dim * 4 / 1024. ** 2
+  print(u"matrix: {:.1f} MiB, {} workers".format(matrix_mib, args.workers))
+  print(u"{:<14}{:<10}{:>10}{:>10}{:>12}".format("loaded by", "arrays",
+                                                 "RSS MiB", "PSS MiB",
+                                                 "private MiB"))
+
+  root = tempfile.mkdtemp()
+  try:
+    source = os.path.join(root, "vectors.npy")
+    np.save(source, np.random.RandomState(0).rand(args.words, args.dim)
+                      .astype(np.float32))
+    for before_fork in (True, False):
+      for enabled in (False, True):
+        shared = SharedArrays(os.path.join(root, str(enabled)), enabled=enabled)
+
+        def load():
+          embedding = Embedding(OrderedVocabulary(words), np.load(source))
+          name = "bench/normalized"
+          if name in shared:
+            embedding.vectors = shared.attach(name)
+          else:
+            embedding.normalize_words(inplace=True)
+            embedding.vectors = shared.share(name, embedding.vectors)
+          return embedding
+
+        if enabled and not before_fork:
+          # Model files are written once, by the first process loading them.
+          load()
+        rss, pss, private = run(load, args.workers, queries, before_fork)
+        print(u"{:<14}{:<10}{:>10.1f}{:>10.1f}{:>12.1f}".format(
+              "parent" if before_fork else "each worker",
+              "shared" if enabled else "private", rss, pss, private))
+  finally:
+    shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+  main()
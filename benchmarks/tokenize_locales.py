@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark sentence and word tokenization throughput per locale.
+
+Usage:
+  python benchmarks/tokenize_locales.py [--input-dir DIR] [--repeat N]
+
+Every locale tokenizes a text of its own language, a short built in sample or
+the file `<lang>.txt` of the input directory. Languages without a file are
+skipped. The cached tokenizers reuse the break iterators pooled per thread,
+the fresh ones compile a new ICU break iterator for every document.
+"""
+
+from __future__ import print_function
+from argparse import ArgumentParser
+from io import open
+from os import path
+import timeit
+
+from icu import BreakIterator
+
+from polyglot.base import Sequence
+from polyglot.tokenize import get_sentence_tokenizer, get_word_tokenizer
+from polyglot.tokenize import SentenceTokenizer, WordTokenizer
+
+
+LANGUAGES = ["ar", "bg", "ca", "cs", "da", "de", "el", "en", "es", "et",
+             "fa", "fi", "fr", "he", "hi", "hr", "hu", "id", "it", "ja",
+             "ko", "lt", "lv", "ms", "nl", "no", "pl", "pt", "ro", "ru",
+             "sk", "sl", "sr", "sv", "th", "tl", "tr", "uk", "vi", "zh"]
+
+SAMPLES = {
+  "ar": u"الطقس جميل اليوم. أنا أقرأ كتابا في الحديقة.",
+  "bg": u"Времето днес е хубаво. Чета книга в парка.",
+  "ca": u"Avui fa bon temps. Estic llegint un llibre al parc.",
+  "cs": u"Dnes je hezké počasí. Čtu knihu v parku.",
+  "da": u"Vejret er godt i dag. Jeg læser en bog i parken.",
+  "de": u"Das Wetter ist heute schön. Ich lese ein Buch im Park.",
+  "el": u"Ο καιρός είναι ωραίος σήμερα. Διαβάζω ένα βιβλίο στο πάρκο.",
+  "en": u"The weather is nice today. I am reading a book in the park.",
+  "es": u"Hoy hace buen tiempo. Estoy leyendo un libro en el parque.",
+  "et": u"Täna on ilus ilm. Ma loen pargis raamatut.",
+  "fa": u"امروز هوا خوب است. من در پارک کتاب می‌خوانم.",
+  "fi": u"Tänään on kaunis sää. Luen kirjaa puistossa.",
+  "fr": u"Il fait beau aujourd'hui. Je lis un livre dans le parc.",
+  "he": u"מזג האוויר נעים היום. אני קורא ספר בפארק.",
+  "hi": u"आज मौसम अच्छा है। मैं पार्क में एक किताब पढ़ रहा हूँ।",
+  "hr": u"Danas je lijepo vrijeme. Čitam knjigu u parku.",
+  "hu": u"Ma szép idő van. Egy könyvet olvasok a parkban.",
+  "id": u"Cuaca hari ini cerah. Saya membaca buku di taman.",
+  "it": u"Oggi il tempo è bello. Sto leggendo un libro nel parco.",
+  "ja": u"今日は天気がいいです。公園で本を読んでいます。",
+  "ko": u"오늘은 날씨가 좋습니다. 공원에서 책을 읽고 있습니다.",
+  "lt": u"Šiandien graži diena. Skaitau knygą parke.",
+  "lv": u"Šodien ir jauks laiks. Es lasu grāmatu parkā.",
+  "ms": u"Cuaca hari ini baik. Saya sedang membaca buku di taman.",
+  "nl": u"Het weer is vandaag mooi. Ik lees een boek in het park.",
+  "no": u"Været er fint i dag. Jeg leser en bok i parken.",
+  "pl": u"Dzisiaj jest ładna pogoda. Czytam książkę w parku.",
+  "pt": u"O tempo está bom hoje. Estou lendo um livro no parque.",
+  "ro": u"Astăzi vremea este frumoasă. Citesc o carte în parc.",
+  "ru": u"Сегодня хорошая погода. Я читаю книгу в парке.",
+  "sk": u"Dnes je pekné počasie. Čítam knihu v parku.",
+  "sl": u"Danes je lepo vreme. Berem knjigo v parku.",
+  "sr": u"Данас је лепо време. Читам књигу у парку.",
+  "sv": u"Vädret är fint i dag. Jag läser en bok i parken.",
+  "th": u"วันนี้อากาศดี ฉันกำลังอ่านหนังสืออยู่ในสวนสาธารณะ",
+  "tl": u"Maganda ang panahon ngayon. Nagbabasa ako ng libro sa parke.",
+  "tr": u"Bugün hava güzel. Parkta bir kitap okuyorum.",
+  "uk": u"Сьогодні гарна погода. Я читаю книжку в парку.",
+  "vi": u"Hôm nay trời đẹp. Tôi đang đọc sách trong công viên.",
+  "zh": u"今天天气很好。我在公园里看书。",
+}
+
+
+class FreshSentenceTokenizer(SentenceTokenizer):
+  """Sentence tokenizer that bypasses the pool of break iterators."""
+
+  @property
+  def breaker(self):
+    return BreakIterator.createSentenceInstance(self.locale)
+
+
+class FreshWordTokenizer(WordTokenizer):
+  """Word tokenizer that bypasses the pool of break iterators."""
+
+  @property
+  def breaker(self):
+    return BreakIterator.createWordInstance(self.locale)
+
+
+def read_samples(dirname):
+  """Return the text of `dirname/<lang>.txt` for every available language."""
+  samples = {}
+  for lang in LANGUAGES:
+    fname = path.join(dirname, "{}.txt".format(lang))
+    if path.exists(fname):
+      with open(fname, encoding="utf-8") as fh:
+        samples[lang] = fh.read()
+  return samples
+
+
+def tokenize(text, sent_tokenizer, word_tokenizer):
+  seq = Sequence(text)
+  sents = sent_tokenizer.transform(seq)
+  words = word_tokenizer.transform(seq)
+  return sum(len(s) for s in words.split(sents))
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--input-dir",
+                      help="directory of <lang>.txt files to be tokenized.")
+  parser.add_argument("--repeat", type=int, default=200,
+                      help="number of documents tokenized per locale.")
+  args = parser.parse_args()
+
+  samples = dict(SAMPLES)
+  if args.input_dir:
+    samples = read_samples(args.input_dir)
+
+  print(u"{:<6}{:>14}{:>14}{:>10}".format("lang", "cached docs/s",
+                                         "fresh docs/s", "tokens"))
+  for lang in LANGUAGES:
+    if lang not in samples:
+      continue
+    text = samples[lang]
+    cached = lambda: tokenize(text, get_sentence_tokenizer(lang),
+                              get_word_tokenizer(lang))
+    fresh = lambda: tokenize(text, FreshSentenceTokenizer(lang),
+                             FreshWordTokenizer(lang))
+    tokens = cached()
+    cached_rate = args.repeat / timeit.timeit(cached, number=args.repeat)
+    fresh_rate = args.repeat / timeit.timeit(fresh, number=args.repeat)
+    print(u"{:<6}{:>14.0f}{:>14.0f}{:>10}".format(lang, cached_rate,
+                                                  fresh_rate, tokens))
+
+
+if __name__ == "__main__":
+  main()
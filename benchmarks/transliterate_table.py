@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark transliteration with in-memory and memory mapped tables.
+
+Usage:
+  python benchmarks/transliterate_table.py [--rules N] [--words N]
+
+A random table is compiled into a trie and saved. The same words are then
+transliterated with the index built from the table, by searching every
+position of a word in the memory mapped trie at once, by searching all the
+words in the memory mapped trie at once, and by walking the memory mapped
+trie a position and a character at a time.
+"""
+
+from __future__ import print_function
+from argparse import ArgumentParser
+import random
+import shutil
+import tempfile
+import time
+
+from polyglot.transliteration import Transliterator
+from polyglot.transliteration.compiled import TransliterationTrie, index_table
+
+
+ALPHABET = u"abcdefghijklmnopqrstuvwxyzåäöé"
+
+
+def random_table(rules, rng):
+  table = {}
+  for c in ALPHABET:
+    table[(c, c.upper())] = rng.random()
+  while len(table) < rules:
+    piece = u"".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 4)))
+    target = u"".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 4)))
+    table[(piece, target.upper())] = rng.random()
+  return table
+
+
+def trie_coder(trie, ngram=6):
+  """The per character trie walk, kept as a baseline."""
+  unlimited = 99999
+
+  def translate(word):
+    word = word.lower().strip()
+    best = [u""] * (len(word)+1)
+    cost = [unlimited] * (len(word)+1)
+    cost[0] = 0
+    for i in range(len(word)):
+      if cost[i] >= unlimited:
+        continue
+      for j, target, c in trie.prefixes(word, i, ngram):
+        if cost[i] + c <= cost[j]:
+          best[j] = best[i] + target
+          cost[j] = cost[i] + c
+    return best[len(word)]
+  return translate
+
+
+def timed(make, words, batch=False):
+  start = time.time()
+  coder = make()
+  built = time.time()
+  outputs = coder(words) if batch else [coder(w) for w in words]
+  return built - start, time.time() - built, outputs
+
+
+def main():
+  parser = ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--rules", type=int, default=12000)
+  parser.add_argument("--words", type=int, default=3000)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  table = random_table(args.rules, rng)
+  words = [u"".join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12)))
+           for _ in range(args.words)]
+
+  dirname = tempfile.mkdtemp()
+  try:
+    TransliterationTrie.from_index(index_table(table)).save(dirname, "coder")
+    mapped = TransliterationTrie.load(dirname, "coder")
+    runs = [
+      ("table index", lambda: Transliterator._transliterate_string(table),
+       False),
+      ("mmap trie", lambda: Transliterator._transliterate_string(mapped),
+       False),
+      ("mmap trie batch",
+       lambda: Transliterator._transliterate_strings(mapped), True),
+      ("mmap trie walk", lambda: trie_coder(mapped), False),
+    ]
+    print(u"{:<16}{:>10}{:>12}".format("coder", "build s", "translate s"))
+    expected = None
+    for name, make, batch in runs:
+      build, translate, outputs = timed(make, words, batch)
+      if expected is None:
+        expected = outputs
+      assert outputs == expected, name
+      print(u"{:<16}{:>10.3f}{:>12.3f}".format(name, build, translate))
+  finally:
+    shutil.rmtree(dirname)
+
+
+if __name__ == "__main__":
+  main()
@@ -16,18 +16,13 @@ import six
 from six import text_type as unicode
 from six import iteritems
 
-from icu import Locale
-
-from polyglot.base import Sequence, TextFile, TextFiles
-from polyglot.detect import Detector
-from polyglot.downloader import Downloader
-from polyglot.load import load_morfessor_model
-from polyglot.mapping import CountedVocabulary
-from polyglot.tag import NEChunker, POSTagger
-from polyglot.tokenize import SentenceTokenizer, WordTokenizer
-from polyglot.transliteration import Transliterator
+from polyglot.base import TextFile, TextFiles
+from polyglot.load import preload, PRELOAD_TASKS
 from polyglot.utils import _print
 
+# The tools import their dependencies when they run, so a command does not
+# pay for loading ICU, pycld2 or morfessor unless it needs them.
+
 if sys.platform == 'win32':
   signal(SIGABRT, SIG_DFL)
 else:
@@ -38,6 +33,7 @@ LOGFORMAT = "%(asctime).19s %(levelname)s %(filename)s: %(lineno)s %(message)s"
 
 def vocab_counter(args):
   """Calculate the vocabulary."""
+  from polyglot.mapping import CountedVocabulary
   if isinstance(args.input, TextFiles):
     v = CountedVocabulary.from_textfiles(args.input, workers=args.workers)
   else:
@@ -51,6 +47,7 @@ def vocab_counter(args):
 
 def detect(args):
   """ Detect the language of each line."""
+  from polyglot.detect import Detector
   for l in args.input:
     if l.strip():
       _print("{:<20}{}".format(Detector(l).language.name, l.strip()))
@@ -67,34 +64,39 @@ def tag(tagger, args):
 
 def transliterate(args):
   """Transliterate words according to the target language."""
+  from polyglot.transliteration import Transliterator
   t = Transliterator(source_lang=args.lang,
                      target_lang=args.target)
   for l in args.input:
     words = l.strip().split()
-    line_annotations = [u"{:<16}{:<16}".format(w, t.transliterate(w)) for w in words]
+    line_annotations = [u"{:<16}{:<16}".format(w, tw) for w, tw in
+                        zip(words, t.transliterate_many(words))]
     _print(u"\n".join(line_annotations))
     _print(u"")
 
 
 def morphemes(args):
   """Segment words according to their morphemes."""
-  morfessor = load_morfessor_model(lang=args.lang)
-  for l in args.input:
-    words = l.strip().split()
-    morphemes = [(w, u"_".join(morfessor.viterbi_segment(w)[0])) for w in words]
-    line_annotations = [u"{:<16}{:<5}".format(w,p) for w, p in morphemes]
+  from polyglot.morphology import segment_corpus
+  annotated = segment_corpus(args.input, lang=args.lang, workers=args.workers,
+                             chunk_size=args.chunk_size)
+  for annotations in annotated:
+    line_annotations = [u"{:<16}{:<5}".format(w, u"_".join(m))
+                        for w, m in annotations]
     _print(u"\n".join(line_annotations))
     _print(u"")
 
 
 def ner_chunk(args):
   """Chunk named entities."""
+  from polyglot.tag import NEChunker
   chunker = NEChunker(lang=args.lang)
   tag(chunker, args)
 
 
 def pos_tag(args):
   """Tag words with their part of speech."""
+  from polyglot.tag import POSTagger
   tagger = POSTagger(lang=args.lang)
   tag(tagger, args)
 
@@ -107,6 +109,7 @@ def cat(args):
 
 def download(args):
   """ Download polyglot packages and models."""
+  from polyglot.downloader import Downloader
 
   downloader = Downloader(server_index_url = args.server_index_url)
   if args.packages:
@@ -121,29 +124,25 @@ def download(args):
                         halt_on_error=args.halt_on_error)
 
 
-def segment(args):
-  lang  = args.lang
-  w_tokenizer = WordTokenizer(locale=lang)
-  s_tokenizer = SentenceTokenizer(locale=lang)
-
-  if args.only_sent:
-    for l in args.input:
-      seq = Sequence(l)
-      if not seq.empty(): _print(s_tokenizer.transform(seq))
+def preload_models(args):
+  """ Load models ahead and report their readiness."""
+  preloader = preload(args.languages, tasks=args.tasks, workers=args.workers,
+                      warmup=not args.no_warmup, wait=True)
+  for lang, task, status, seconds, error in preloader.report():
+    details = u"{:.2f}s".format(seconds) if error is None else unicode(error)
+    _print(u"{:<8}{:<16}{:<8}{}".format(lang, task, status, details))
+  if not preloader.ready():
+    return 1
 
-  elif args.only_word:
-    for l in args.input:
-      seq = Sequence(l)
-      if not seq.empty(): _print(w_tokenizer.transform(seq))
 
-  else:
-    for l in args.input:
-      seq = Sequence(l)
-      sents = s_tokenizer.transform(seq)
-      words = w_tokenizer.transform(seq)
-      for tokenized_sent in words.split(sents):
-        if not tokenized_sent.empty():
-          _print(u' '.join(tokenized_sent.tokens()))
+def segment(args):
+  from polyglot.tokenize import StreamSegmenter
+  segmenter = StreamSegmenter(locale=args.lang, delimiter=args.delimiter,
+                              sentences=not args.only_word,
+                              words=not args.only_sent,
+                              block_size=args.block_size)
+  for output in segmenter.transform(args.input, workers=args.workers):
+    _print(output)
 
 
 def remove_escape(text):
@@ -185,6 +184,9 @@ def main():
 
   # Morphological Analyzer
   morph = subparsers.add_parser('morph')
+  morph.add_argument("--chunk-size", default=10000, type=int,
+                     help="Number of lines whose distinct words are segmented "
+                          "together.")
   morph.set_defaults(func=morphemes)
 
   # Tokenizer
@@ -195,6 +197,8 @@ def main():
                       help="Segment sentences without word tokenization")
   group1.add_argument("--only-word", default=False, action="store_true",
                       help="Tokenize words without sentence segmentation")
+  tokenizer.add_argument("--block-size", default=1 << 20, type=int,
+                         help="Number of characters to be read at once.")
   tokenizer.set_defaults(func=segment)
 
   # Package downloader
@@ -214,6 +218,20 @@ def main():
                           default=None, help="download server index url")
   downloader.set_defaults(func=download)
 
+  # Model preloader
+  preloader = subparsers.add_parser('preload',
+                                    help="Load models ahead and report their "
+                                         "readiness.")
+  preloader.add_argument("languages", nargs='+',
+                         help="Language codes of the models.")
+  preloader.add_argument("--tasks", nargs='+', default=["ner", "pos"],
+                         choices=PRELOAD_TASKS,
+                         help="Tasks whose models are loaded.")
+  preloader.add_argument("--no-warmup", dest="no_warmup", action="store_true",
+                         default=False,
+                         help="Do not run the models on a sample.")
+  preloader.set_defaults(func=preload_models)
+
   # Vocabulary Counter
   counter = subparsers.add_parser('count',
                                   help="Count words frequency in a corpus.")
@@ -251,7 +269,7 @@ def main():
   senti = subparsers.add_parser('sentiment',
                                 help="Classify text to positive and negative polarity.")
   for name, subparser in parser._subparsers._group_actions[0].choices.items():
-    if name == 'download': continue
+    if name in ('download', 'preload'): continue
     subparser.add_argument('--input', nargs='*', type=TextFile,
                            default=[TextFile(sys.stdin.fileno())])
 
@@ -273,13 +291,14 @@ def main():
   except AttributeError:
       parser.error('Too few arguments')
 
-  if func != download:
+  if func not in {download, preload_models}:
     if len(args.input) > 1:
       args.input = TextFiles(args.input)
     else:
       args.input = args.input[0]
 
     if args.lang == 'detect' and func not in language_agnostic:
+      from polyglot.detect import Detector
       header = 4096
       text = args.input.peek(header)
       lang = Detector(text).language
@@ -289,7 +308,7 @@ def main():
 
     args.delimiter = remove_escape(args.delimiter)
     args.input.delimiter = args.delimiter
-  args.func(args)
+  return args.func(args)
 
 if __name__ == '__main__':
   sys.exit(main())
@@ -6,9 +6,9 @@
 from io import open, StringIO
 from collections import Counter
 import os
-from concurrent.futures import ProcessPoolExecutor
 from itertools import islice
 
+import numpy as np
 import six
 from six.moves import zip
 from six import text_type as unicode
@@ -51,16 +51,24 @@ class Sequence(object):
     return u'\n'.join(self.tokens())
 
   def split(self, sequence):
-    """ Split into subsequences according to `sequence`."""
+    """ Split into subsequences according to `sequence`.
 
-    major_idx = sequence.idx
-    idx2 = 0
-    for start, end in zip(major_idx[:-1], major_idx[1:]):
-      idx1 = self.idx.index(start, idx2)
-      idx2 = self.idx.index(end, idx2)
-      seq = Sequence(self.text[start:end])
-      seq.idx = [x-start for x in self.idx[idx1:idx2]]
-      yield seq
+    The boundaries of `sequence` are located among the boundaries of this
+    sequence by a single binary search over both sorted arrays. The
+    subsequences are views that share the text of this sequence.
+    """
+
+    idx = np.asarray(self.idx)
+    major_idx = np.asarray(sequence.idx)
+    positions = np.searchsorted(idx, major_idx)
+    found = idx[np.minimum(positions, len(idx) - 1)]
+    if (found != major_idx).any():
+      missing = major_idx[found != major_idx][0]
+      raise ValueError("{} is not a boundary of this sequence".format(missing))
+    for start, end, idx1, idx2 in zip(major_idx[:-1], major_idx[1:],
+                                      positions[:-1], positions[1:]):
+      yield SequenceView(self, int(start), int(end),
+                         (idx[idx1:idx2+1] - start).tolist())
 
   def __len__(self):
     return len(self.idx) - 1
@@ -69,6 +77,33 @@ class Sequence(object):
     return not self.text.strip()
 
 
+class SequenceView(Sequence):
+  """ A subsequence that refers to the text of its parent sequence.
+
+  Args:
+    parent (Sequence): sequence that owns the text.
+    start (integer): offset of the subsequence in the parent text.
+    end (integer): offset of the end of the subsequence in the parent text.
+    idx (list): boundaries relative to `start`.
+  """
+
+  def __init__(self, parent, start, end, idx):
+    self.parent = parent
+    self.start = start
+    self.end = end
+    self.idx = idx
+
+  @property
+  def text(self):
+    return self.parent.text[self.start: self.end]
+
+  def __iter__(self):
+    text = self.parent.text
+    offset = self.start
+    for start, end in zip(self.idx[:-1], self.idx[1:]):
+      yield text[offset+start: offset+end]
+
+
 class TokenSequence(list):
   """A list of tokens.
 
@@ -181,6 +216,7 @@ class TextFile(object):
       for lines in self.iter_chunks(job_size):
         yield func(lines)
     else:
+      from concurrent.futures import ProcessPoolExecutor
       with ProcessPoolExecutor(max_workers=workers) as executor:
         for result in executor.map(func, self.iter_chunks(job_size)):
           yield result
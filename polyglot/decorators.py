@@ -1,7 +1,20 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from collections import OrderedDict
 import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
 
 class cached_property(object):
   """A property that is only computed once per instance and then replaces
@@ -20,13 +33,280 @@ class cached_property(object):
     value = obj.__dict__[self.func.__name__] = self.func(obj)
     return value
 
+
+_MISSING = object()
+
+
+class SingleFlight(object):
+  """Run at most one load per key at a time.
+
+  Callers that ask for a key while it is being loaded wait for that load
+  instead of starting their own. The duration of every load is recorded.
+
+  Attributes:
+    timings (dict): seconds taken by the last load of every key.
+  """
+
+  def __init__(self):
+    self.timings = {}
+    self._loading = {}
+    self._lock = threading.Lock()
+
+  def run(self, key, lookup, load):
+    """Return the value of `key`, loading it only if no one else is.
+
+    Args:
+      key: hashable identifier of the value.
+      lookup (function): returns the stored value of a key, or `_MISSING`.
+      load (function): computes and stores the value, then returns it.
+    """
+    while True:
+      value = lookup(key)
+      if value is not _MISSING:
+        return value
+      with self._lock:
+        event = self._loading.get(key)
+        if event is None:
+          event = self._loading[key] = threading.Event()
+          break
+      event.wait()
+
+    try:
+      value = lookup(key)
+      if value is not _MISSING:
+        return value
+      start = time.time()
+      value = load()
+      self.timings[key] = time.time() - start
+      logger.debug("Loaded {} in {:.3f} seconds".format(key, self.timings[key]))
+      return value
+    finally:
+      with self._lock:
+        del self._loading[key]
+      event.set()
+
+
 def memoize(obj):
   cache = obj.cache = {}
+  flight = SingleFlight()
 
   @functools.wraps(obj)
   def memoizer(*args, **kwargs):
     key = tuple(list(args) + sorted(kwargs.items()))
-    if key not in cache:
+
+    def load():
       cache[key] = obj(*args, **kwargs)
-    return cache[key]
+      return cache[key]
+    return flight.run(key, lambda k: cache.get(k, _MISSING), load)
+  memoizer.timings = flight.timings
   return memoizer
+
+
+def estimate_size(obj, exclude=(), shared=None):
+  """Estimate the memory held by `obj` in bytes.
+
+  Arrays count the buffers they own or the arrays they view, containers and
+  instance attributes are followed. Objects are counted once, and those in `exclude` not at all.
+
+  Args:
+    obj: object to be measured.
+    exclude (iterable): objects whose memory is accounted for elsewhere.
+    shared (list): collects the objects of `exclude` that `obj` references.
+  """
+  excluded = set(id(x) for x in exclude)
+  seen = set()
+  stack = [obj]
+  size = 0
+  while stack:
+    x = stack.pop()
+    if id(x) in seen:
+      continue
+    seen.add(id(x))
+    if id(x) in excluded:
+      if shared is not None:
+        shared.append(x)
+      continue
+    if isinstance(x, (type, types.ModuleType, types.FunctionType,
+                      types.MethodType)):
+      continue
+    size += sys.getsizeof(x)
+    if isinstance(x, np.ndarray):
+      if x.base is not None:
+        stack.append(x.base)
+    elif isinstance(x, dict):
+      stack.extend(x.keys())
+      stack.extend(x.values())
+    elif isinstance(x, (list, tuple, set, frozenset)):
+      stack.extend(x)
+    elif hasattr(x, "__dict__"):
+      stack.append(vars(x))
+  return size
+
+
+class ModelCache(object):
+  """A cache of loaded models bounded by their estimated memory.
+
+  Once the models exceed the memory budget, the least recently used ones are
+  evicted. Models of pinned languages are never evicted. Concurrent requests
+  of a model that is not resident wait for a single load.
+
+  Attributes:
+    budget (integer): memory budget in bytes, None for no bound.
+    size (integer): estimated memory of the resident models in bytes.
+    timings (dict): seconds taken by the last load of every model.
+  """
+
+  def __init__(self, budget=None):
+    self.budget = budget
+    self.size = 0
+    self._entries = OrderedDict()
+    self._pinned = set()
+    self._lock = threading.RLock()
+    self._flight = SingleFlight()
+    self.timings = self._flight.timings
+
+  def cached(self, func=None, lang="lang"):
+    """Decorate a loader whose results are kept in this cache.
+
+    Calls are identified by the loader name and all of its arguments, so
+    positional and keyword calls share an entry.
+
+    Args:
+      func (function): the loader, the decorator takes arguments without it.
+      lang (string or tuple): name of the argument holding the language the
+                              model belongs to, or a tuple of the names of
+                              the arguments of all its languages.
+    """
+    if func is None:
+      return functools.partial(self.cached, lang=lang)
+    names = lang if isinstance(lang, tuple) else (lang,)
+
+    @functools.wraps(func)
+    def loader(*args, **kwargs):
+      callargs = inspect.getcallargs(func, *args, **kwargs)
+      key = (func.__name__,) + tuple(sorted(callargs.items()))
+      langs = tuple(callargs.get(name) for name in names)
+      return self.get(key, lambda: func(*args, **kwargs),
+                      lang=langs if len(langs) > 1 else langs[0])
+    loader.cache = self
+    return loader
+
+  def _lookup(self, key):
+    with self._lock:
+      if key not in self._entries:
+        return _MISSING
+      entry = self._entries.pop(key)
+      self._entries[key] = entry
+      return entry["model"]
+
+  def get(self, key, load, lang=None):
+    """Return the model of `key`, calling `load` if it is not resident.
+
+    `lang` is the language of the model or a tuple of its languages.
+    """
+    def load_and_put():
+      model = load()
+      self.put(key, model, lang=lang)
+      return model
+    return self._flight.run(key, self._lookup, load_and_put)
+
+  def _measure(self, key, model):
+    """Return the memory `model` holds beyond the other resident models.
+
+    Returns:
+      the estimated size and the keys of the resident models it references.
+    """
+    others = dict((id(e["model"]), k) for k, e in self._entries.items()
+                  if k != key)
+    shared = []
+    size = estimate_size(model, exclude=[self._entries[k]["model"]
+                                         for k in others.values()],
+                         shared=shared)
+    return size, set(others[id(x)] for x in shared)
+
+  def put(self, key, model, lang=None):
+    """Add `model` to the cache under `key`, evicting models if needed."""
+    with self._lock:
+      self.discard(key)
+      size, shares = self._measure(key, model)
+      self._entries[key] = {"model": model, "lang": lang, "size": size,
+                            "shares": shares}
+      self.size += size
+      self._shrink(keep=key)
+
+  def discard(self, key):
+    """Remove the model of `key` from the cache, if it is resident.
+
+    Memory the model shares with other resident models stays alive, so it is
+    charged to the models that reference it from then on.
+    """
+    with self._lock:
+      entry = self._entries.pop(key, None)
+      if entry is None:
+        return
+      self.size -= entry["size"]
+      for other_key, other in self._entries.items():
+        if key in other["shares"]:
+          size, other["shares"] = self._measure(other_key, other["model"])
+          self.size += size - other["size"]
+          other["size"] = size
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self.size = 0
+
+  def _shrink(self, keep=None):
+    if self.budget is None:
+      return
+    while self.size > self.budget:
+      for key in self._entries:
+        if key != keep and not self._is_pinned(self._entries[key]):
+          break
+      else:
+        return
+      self.discard(key)
+
+  def set_budget(self, budget):
+    """Change the memory budget, evicting models that do not fit anymore."""
+    with self._lock:
+      self.budget = budget
+      self._shrink()
+
+  def _is_pinned(self, entry):
+    langs = entry["lang"]
+    if not isinstance(langs, tuple):
+      langs = (langs,)
+    return any(lang in self._pinned for lang in langs)
+
+  def pin(self, lang):
+    """Never evict the models of `lang`, or of several languages one of
+    which is `lang`."""
+    with self._lock:
+      self._pinned.add(lang)
+
+  def unpin(self, lang):
+    """Allow the models of `lang` to be evicted again."""
+    with self._lock:
+      self._pinned.discard(lang)
+      self._shrink()
+
+  @property
+  def pinned(self):
+    return set(self._pinned)
+
+  def resident(self):
+    """Return the resident models, least recently used first.
+
+    Returns:
+      list of (key, language, estimated size, pinned) tuples.
+    """
+    with self._lock:
+      return [(key, e["lang"], e["size"], self._is_pinned(e))
+              for key, e in self._entries.items()]
+
+  def __contains__(self, key):
+    return key in self._entries
+
+  def __len__(self):
+    return len(self._entries)
@@ -9,7 +9,6 @@ import logging
 
 
 from icu import Locale
-import pycld2 as cld2
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +66,7 @@ class Detector(object):
   @staticmethod
   def supported_languages():
     """Returns a list of the languages that can be detected by pycld2."""
+    import pycld2 as cld2
     return [name.capitalize() for name,code in cld2.LANGUAGES if not name.startswith("X_")]
 
   def detect(self, text):
@@ -80,6 +80,7 @@ class Detector(object):
       text (string): A snippet of text, the longer it is the more reliable we
                      can detect the language used to write the text.
     """
+    import pycld2 as cld2
     t = text.encode("utf-8")
     reliable, index, top_3_choices = cld2.detect(t, bestEffort=False)
 
@@ -89,7 +89,7 @@ from json import loads
 
 from polyglot import polyglot_path
 from polyglot.detect.langids import isoLangs
-from polyglot.utils import pretty_list
+from polyglot.utils import pretty_list, ResourceManifest
 from icu import Locale
 
 import stat
@@ -582,7 +582,11 @@ class Downloader(object):
 
     # Do we already have the current version?
     status = self.status(info, download_dir)
+    manifest = ResourceManifest.for_root(download_dir)
+    filepath = os.path.join(download_dir, info.filename)
     if not force and status == self.INSTALLED:
+      if manifest.get(info.id) is None:
+        manifest.add(info.id, filepath)
       yield UpToDateMessage(info)
       yield ProgressMessage(100)
       yield FinishPackageMessage(info)
@@ -592,7 +596,7 @@ class Downloader(object):
     self._status_cache.pop(info.id, None)
 
     # Check for (and remove) any old/stale version.
-    filepath = os.path.join(download_dir, info.filename)
+    manifest.discard(info.id)
     if os.path.exists(filepath):
       if status == self.STALE:
         yield StaleMessage(info)
@@ -638,6 +642,8 @@ class Downloader(object):
           yield msg
         yield FinishUnzipMessage(info)
 
+    # Record the installed file so loaders can find it without a scan.
+    manifest.add(info.id, filepath)
     yield FinishPackageMessage(info)
 
   def download(self, info_or_id=None, download_dir=None, quiet=False,
@@ -1,24 +1,38 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
 from os import path
+import logging
 import os
-from tempfile import NamedTemporaryFile
+import time
 
 import numpy as np
-import morfessor
 
 from six import PY2
 from six.moves import cPickle as pickle
 
 from . import polyglot_path
-from .decorators import memoize
-from .downloader import downloader
+from .decorators import ModelCache
 from .mapping import Embedding, CountedVocabulary, CaseExpander, DigitExpander
 
-from .utils import _open
+from .utils import _open, _replace, ResourceManifest, SharedArrays
 
 
+logger = logging.getLogger(__name__)
+
+model_cache = ModelCache(
+  budget=int(os.environ.get("POLYGLOT_MODEL_CACHE_BUDGET", 0)) or None)
+"""Models loaded by this module, bounded by POLYGLOT_MODEL_CACHE_BUDGET bytes."""
+
+shared_arrays = SharedArrays(
+  path.join(polyglot_path, "compiled", "shared"),
+  enabled=bool(os.environ.get("POLYGLOT_SHARED_MEMORY")))
+"""Large arrays of the embeddings and taggers, memory mapped read only when
+enabled, e.g. by setting POLYGLOT_SHARED_MEMORY=1."""
+
 resource_dir = {
   "cw_embeddings":"embeddings2",
   "sgns_embeddings":"sgns2",
@@ -32,22 +46,74 @@ resource_dir = {
 def locate_resource(name, lang, filter=None):
   """Return filename that contains specific language resource name.
 
+  Installed resources are resolved through the manifest kept by the
+  downloader. Resources missing from the manifest are searched for on disk
+  and recorded, so later lookups are a single dictionary access and a stat
+  of the recorded file.
+
   Args:
     name (string): Name of the resource.
     lang (string): language code to be loaded.
   """
   task_dir = resource_dir.get(name, name)
   package_id = u"{}.{}".format(task_dir, lang)
+  manifest = ResourceManifest.for_root(polyglot_path)
+  filename = manifest.locate(package_id)
+  if filename is not None:
+    if path.exists(filename):
+      return filename
+    # Removed outside of the downloader.
+    manifest.discard(package_id)
+
   p = path.join(polyglot_path, task_dir, lang)
   if not path.isdir(p):
+    from .downloader import downloader
     if downloader.status(package_id) != downloader.INSTALLED:
       raise ValueError("This resource is available in the index "
                        "but not downloaded, yet. Try to run\n\n"
                        "polyglot download {}".format(package_id))
-  return path.join(p, os.listdir(p)[0])
+  filename = path.join(p, os.listdir(p)[0])
+  manifest.add(package_id, filename)
+  return filename
+
+
+def compiled_dir(name, lang):
+  """Return the directory that holds the compiled form of a resource.
+
+  Compiled resources are kept apart from the downloaded packages under
+  `polyglot_data/compiled`.
+
+  Args:
+    name (string): Name of the resource.
+    lang (string): language code of the resource.
+  """
+  task_dir = resource_dir.get(name, name)
+  return path.join(polyglot_path, "compiled", task_dir, lang)
+
+
+def _load_normalized_embeddings(fname, dirname):
+  """Return the embeddings saved in `fname` with normalized vectors.
+
+  The normalized embeddings are saved into `dirname` the first time, later
+  loads memory map the normalized vectors instead of normalizing them again.
+  """
+  dirname = path.join(dirname, "normalized")
+  try:
+    if Embedding.saved_time(dirname) >= path.getmtime(fname):
+      return Embedding.load_arrays(dirname)
+  except (IOError, OSError):
+    pass
+  e = Embedding.load(fname)
+  e.normalize_words(inplace=True)
+  try:
+    e.save_arrays(dirname)
+  except (IOError, OSError) as error:
+    logger.warning("The normalized embeddings could not be saved into "
+                   "{}\n{}".format(dirname, error))
+  return e
 
 
-@memoize
+@model_cache.cached
 def load_embeddings(lang="en", task="embeddings", type="cw", normalize=False):
   """Return a word embeddings object for `lang` and of type `type`
 
@@ -59,7 +125,10 @@ def load_embeddings(lang="en", task="embeddings", type="cw", normalize=False):
   """
   src_dir = "_".join((type, task)) if type else task
   p = locate_resource(src_dir, lang)
-  e = Embedding.load(p)
+  if normalize:
+    e = _load_normalized_embeddings(p, compiled_dir(src_dir, lang))
+  else:
+    e = Embedding.load(p)
   if type == "cw":
     e.apply_expansion(CaseExpander)
     e.apply_expansion(DigitExpander)
@@ -67,12 +136,13 @@ def load_embeddings(lang="en", task="embeddings", type="cw", normalize=False):
     e.apply_expansion(CaseExpander)
   if type == "ue":
     e.apply_expansion(CaseExpander)
-  if normalize:
-    e.normalize_words(inplace=True)
+  name = "{}/{}/{}".format(src_dir, lang,
+                           "normalized" if normalize else "vectors")
+  e.vectors = shared_arrays.share(name, e.vectors, source=p)
   return e
 
 
-@memoize
+@model_cache.cached
 def load_vocabulary(lang="en", type="wiki"):
   """Return a CountedVocabulary object.
 
@@ -85,7 +155,7 @@ def load_vocabulary(lang="en", type="wiki"):
   return CountedVocabulary.from_vocabfile(p)
 
 
-@memoize
+@model_cache.cached
 def load_ner_model(lang="en", version="2"):
   """Return a named entity extractor parameters for `lang` and of version `version`
 
@@ -97,13 +167,14 @@ def load_ner_model(lang="en", version="2"):
   p = locate_resource(src_dir, lang)
   fh = _open(p)
   try:
-    return pickle.load(fh)
+    model = pickle.load(fh)
   except UnicodeDecodeError:
     fh.seek(0)
-    return pickle.load(fh, encoding='latin1')
+    model = pickle.load(fh, encoding='latin1')
+  return shared_arrays.share_all("{}/{}".format(src_dir, lang), model, source=p)
 
 
-@memoize
+@model_cache.cached
 def load_pos_model(lang="en", version="2"):
   """Return a part of speech tagger parameters for `lang` and of version `version`
 
@@ -114,37 +185,95 @@ def load_pos_model(lang="en", version="2"):
   src_dir = "pos{}".format(version)
   p = locate_resource(src_dir, lang)
   fh = _open(p)
-  return dict(np.load(fh))
+  return shared_arrays.share_all("{}/{}".format(src_dir, lang),
+                                 dict(np.load(fh)), source=p)
 
 
-@memoize
+@model_cache.cached
 def load_unified_pos_model(lang="en"):
   src_dir = "unipos"
   p = locate_resource(src_dir, lang)
-  return dict(np.load(p))
+  return shared_arrays.share_all("{}/{}".format(src_dir, lang),
+                                 dict(np.load(p)), source=p)
+
+
+def _read_segmentations(content):
+  """Parse a Morfessor segmentation file held in memory.
+
+  Note:
+    File has the following format count1 morph1 + morph2
+                                  count2 morph3
+  """
+  import morfessor
+  io = morfessor.MorfessorIO()
+  for line in content.decode("utf-8").splitlines():
+    line = line.rstrip()
+    if not line or line.startswith(io.comment_start):
+      continue
+    count, compound = line.split(u' ', 1)
+    constructions = tuple(compound.split(io.construction_separator))
+    yield int(count), u"".join(constructions), constructions
+
+
+def _read_morfessor_model(content):
+  """Return a Morfessor model out of a binary model or a segmentation file.
+
+  Segmentation files are text that starts with a comment or a count, which
+  no pickle does, so anything else is unpickled as a binary model.
+  """
+  head = content.lstrip()[:1]
+  if not head or head in b"#0123456789":
+    import morfessor
+    model = morfessor.BaselineModel()
+    model.load_segmentations(_read_segmentations(content))
+    return model
+  if PY2:
+    return pickle.loads(content)
+  return pickle.loads(content, encoding='latin1')
 
 
-@memoize
+@model_cache.cached
 def load_morfessor_model(lang="en", version="2"):
   """Return a morfessor model for `lang` and of version `version`
 
+  The model is parsed from the archive stream. Segmentation files are
+  converted to a binary model once and saved with the compiled resources,
+  so later loads only unpickle it.
+
   Args:
     lang (string): language code.
     version (string): version of the parameters to be used.
   """
   src_dir = "morph{}".format(version)
   p = locate_resource(src_dir, lang)
-  file_handler = _open(p)
-  tmp_file_ = NamedTemporaryFile(delete=False)
-  tmp_file_.write(file_handler.read())
-  tmp_file_.close()
-  io = morfessor.MorfessorIO()
-  model = io.read_any_model(tmp_file_.name)
-  os.remove(tmp_file_.name)
+  fname = path.join(compiled_dir(src_dir, lang), "model.pkl")
+  try:
+    if path.getmtime(fname) >= path.getmtime(p):
+      with open(fname, "rb") as fh:
+        return pickle.load(fh)
+  except (IOError, OSError):
+    pass
+
+  content = _open(p).read()
+  model = _read_morfessor_model(content)
+  try:
+    if not path.isdir(path.dirname(fname)):
+      os.makedirs(path.dirname(fname))
+    tmp = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+      with open(tmp, "wb") as fh:
+        pickle.dump(model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+      _replace(tmp, fname)
+    finally:
+      if path.exists(tmp):
+        os.remove(tmp)
+  except (IOError, OSError) as e:
+    logger.warning("The binary morfessor model of {} could not be saved into "
+                   "{}\n{}".format(lang, fname, e))
   return model
 
 
-@memoize
+@model_cache.cached
 def load_transliteration_table(lang="en", version="2"):
   """Return a morfessor model for `lang` and of version `version`
 
@@ -156,3 +285,195 @@ def load_transliteration_table(lang="en", version="2"):
   p = locate_resource(src_dir, lang)
   file_handler = _open(p)
   return pickle.load(file_handler)
+
+
+def compile_transliteration_model(lang="en", version="2", dirname=None):
+  """Compile the transliteration table of `lang` into memory mappable tries.
+
+  Args:
+    lang (string): language code.
+    version (string): version of the table to be compiled.
+    dirname (string): directory to save the compiled model into, defaults to
+                      the compiled resources directory. The model is not
+                      saved if the directory can not be written.
+
+  Returns:
+    A dictionary of the encoder and decoder tries.
+  """
+  from .transliteration.compiled import TransliterationTrie, index_table
+  weights = load_transliteration_table(lang=lang, version=version)
+  model = {coder: TransliterationTrie.from_index(index_table(weights[coder]))
+           for coder in ("encoder", "decoder")}
+  if dirname is None:
+    dirname = compiled_dir("transliteration{}".format(version), lang)
+  try:
+    for coder, trie in model.items():
+      trie.save(dirname, coder)
+  except (IOError, OSError) as e:
+    logger.warning("The compiled transliteration model of {} could not be "
+                   "saved into {}\n{}".format(lang, dirname, e))
+  return model
+
+
+@model_cache.cached
+def load_transliteration_model(lang="en", version="2"):
+  """Return the compiled transliteration model for `lang` and of version `version`
+
+  The model is compiled from the transliteration table the first time it is
+  needed or when the table changes. Later loads memory map the compiled
+  tries, which lets processes share them.
+
+  Args:
+    lang (string): language code.
+    version (string): version of the parameters to be used.
+  """
+  from .transliteration.compiled import TransliterationTrie
+  src_dir = "transliteration{}".format(version)
+  p = locate_resource(src_dir, lang)
+  dirname = compiled_dir(src_dir, lang)
+  coders = ("encoder", "decoder")
+  try:
+    saved = min(TransliterationTrie.saved_time(dirname, c) for c in coders)
+    if saved >= path.getmtime(p):
+      return {c: TransliterationTrie.load(dirname, c) for c in coders}
+  except (IOError, OSError):
+    pass
+  return compile_transliteration_model(lang=lang, version=version,
+                                       dirname=dirname)
+
+
+def _preload_task(lang, task, warmup=True):
+  """Load the models `task` needs for `lang` and run them once.
+
+  Note:
+    This is a helper function for `preload`.
+
+  Returns:
+    seconds spent.
+  """
+  start = time.time()
+  sample = [u"Polyglot", u"warms", u"up", u"."]
+  if task == "embeddings":
+    e = load_embeddings(lang=lang, type="sgns", task="embeddings")
+    if warmup:
+      e.get(sample[0])
+  elif task == "sentiment":
+    e = load_embeddings(lang=lang, type="", task="sentiment")
+    if warmup:
+      e.get(sample[0])
+  elif task in ("ner", "pos", "transfer_pos"):
+    from .tag import get_ner_tagger, get_pos_tagger, get_transfer_pos_tagger
+    getters = {"ner": get_ner_tagger, "pos": get_pos_tagger,
+               "transfer_pos": get_transfer_pos_tagger}
+    tagger = getters[task](lang=lang)
+    if warmup:
+      list(tagger.annotate(sample))
+  elif task == "morph":
+    model = load_morfessor_model(lang=lang)
+    if warmup:
+      model.viterbi_segment(sample[0])
+  elif task == "segmenter":
+    from .morphology import get_morpheme_segmenter
+    segmenter = get_morpheme_segmenter(lang=lang)
+    # The segmenter fetches its model on first use.
+    segmenter.model
+    if warmup:
+      segmenter.segment(sample[0])
+  elif task == "transliteration":
+    from .transliteration import get_transliterator
+    transliterator = get_transliterator(source_lang=lang, target_lang="en")
+    if warmup:
+      transliterator.transliterate(sample[0])
+  elif task == "tokenize":
+    # Break iterators belong to the thread that uses them, so running a
+    # tokenizer here would only warm up this thread. The rules compiled once
+    # per process are shared by all threads.
+    from .tokenize import get_sentence_tokenizer, get_word_tokenizer
+    from .tokenize.base import compile_break_iterators
+    get_sentence_tokenizer(locale=lang)
+    get_word_tokenizer(locale=lang)
+    compile_break_iterators(lang)
+  else:
+    raise ValueError("Unknown task {}, expected one of {}".format(
+                     task, ", ".join(PRELOAD_TASKS)))
+  return time.time() - start
+
+
+PRELOAD_TASKS = ["embeddings", "morph", "ner", "pos", "segmenter", "sentiment",
+                 "tokenize", "transfer_pos", "transliteration"]
+
+
+class Preloader(object):
+  """Models of several languages and tasks loading in background threads.
+
+  Attributes:
+    futures (OrderedDict): (lang, task) -> future of the loading task.
+  """
+
+  def __init__(self, langs, tasks, workers=4, warmup=True):
+    """
+    Args:
+      langs (list): language codes.
+      tasks (list): tasks out of `PRELOAD_TASKS` whose models are loaded.
+      workers (integer): number of loading threads.
+      warmup (boolean): run every loaded model once on a sample.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    self.futures = OrderedDict()
+    for lang in langs:
+      for task in tasks:
+        self.futures[(lang, task)] = executor.submit(_preload_task, lang, task,
+                                                     warmup)
+    executor.shutdown(wait=False)
+
+  def ready(self):
+    """Return whether all the models are loaded successfully."""
+    return all(f.done() and f.exception() is None
+               for f in self.futures.values())
+
+  def wait(self, timeout=None):
+    """Wait for the loading to finish and return whether all succeeded."""
+    wait_futures(list(self.futures.values()), timeout=timeout)
+    return self.ready()
+
+  def report(self):
+    """Return the loading status of every language and task.
+
+    Returns:
+      list of (lang, task, status, seconds, error) tuples, where status is
+      one of loading, ready or failed.
+    """
+    rows = []
+    for (lang, task), f in self.futures.items():
+      if not f.done():
+        rows.append((lang, task, "loading", None, None))
+      elif f.exception() is not None:
+        rows.append((lang, task, "failed", None, f.exception()))
+      else:
+        rows.append((lang, task, "ready", f.result(), None))
+    return rows
+
+
+def preload(langs, tasks=("ner", "pos"), workers=4, warmup=True, wait=False):
+  """Load the models of `tasks` for `langs` in background threads.
+
+  Services can call it before taking traffic. Preforking servers should call
+  it with `wait` set in the parent process, so the workers inherit the
+  loaded models. With `shared_arrays` enabled, the embeddings and tagger
+  weights are memory mapped read only and the workers share their pages
+  instead of copying them.
+
+  Args:
+    langs (list): language codes.
+    tasks (list): tasks out of `PRELOAD_TASKS` whose models are loaded.
+    workers (integer): number of loading threads.
+    warmup (boolean): run every loaded model once on a sample.
+    wait (boolean): return only after all the loads finish.
+
+  Returns:
+    A `Preloader` to check the readiness of the models.
+  """
+  preloader = Preloader(langs, tasks, workers=workers, warmup=warmup)
+  if wait:
+    preloader.wait()
+  return preloader
@@ -1,10 +1,12 @@
 from .base import CountedVocabulary, OrderedVocabulary, VocabularyBase
 from .embeddings import Embedding
 from .expansion import CaseExpander, DigitExpander
+from .sharded import ShardedEmbedding
 
 __all__ = ['CountedVocabulary',
            'OrderedVocabulary',
            'VocabularyBase',
            'Embedding',
+           'ShardedEmbedding',
            'CaseExpander',
            'DigitExpander']
@@ -6,7 +6,6 @@
 from io import open, StringIO
 from collections import Counter
 import os
-from concurrent.futures import ProcessPoolExecutor
 
 import six
 from six.moves import zip
@@ -184,6 +183,7 @@ class CountedVocabulary(OrderedVocabulary):
       for lines in files.iter_chunks(job_size):
         c.update(count(lines))
     else:
+      from concurrent.futures import ProcessPoolExecutor
       with ProcessPoolExecutor(max_workers=workers) as executor:
         for counter_ in executor.map(CountedVocabulary.from_textfile, files.names):
           c.update(Counter(counter_.word_count))
@@ -3,9 +3,11 @@
 
 """Defines classes related to mapping vocabulary to n-dimensional points."""
 
+from collections import OrderedDict
 from io import open
 import logging
 from os import path
+import os
 import tarfile
 
 import numpy as np
@@ -19,11 +21,14 @@ from six import string_types
 from six.moves import cPickle as pickle
 
 from .base import CountedVocabulary, OrderedVocabulary
-from ..utils import _open, _decode
+from ..utils import _open, _decode, _replace
 
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1 << 16
+"""Number of rows processed at once by the operations over the whole matrix."""
+
 
 class Embedding(object):
   """ Mapping a vocabulary to a d-dimensional points."""
@@ -36,8 +41,91 @@ class Embedding(object):
       raise ValueError("Vocabulary has {} items but we have {} "
                        "vectors".format(len(vocabulary), self.vectors.shape[0]))
 
+  @property
+  def vocabulary(self):
+    return self._vocabulary
+
+  @vocabulary.setter
+  def vocabulary(self, vocabulary):
+    self._vocabulary = vocabulary
+    self._averages = None
+
+  @property
+  def vectors(self):
+    return self._vectors
+
+  @vectors.setter
+  def vectors(self, vectors):
+    self._vectors = vectors
+    self._norms = None
+    self._averages = None
+
+  @property
+  def norms(self):
+    """L2 norms of the vectors, computed once per matrix."""
+    if self._norms is None:
+      self._norms = self._row_norms(None)
+    return self._norms
+
+  def _row_norms(self, ord, chunk_size=CHUNK_SIZE):
+    vectors = self.vectors
+    norms = np.empty(len(vectors), dtype=np.result_type(vectors, np.float32))
+    for start in xrange(0, len(vectors), chunk_size):
+      stop = start + chunk_size
+      norms[start:stop] = np.linalg.norm(vectors[start:stop], ord, axis=1)
+    return norms
+
+  @property
+  def averages(self):
+    """Averaged vectors of the words an expansion maps to several ids.
+
+    Expansions with the `average` strategy map a word to the tuple of ids of
+    the words it was formatted from. Their averages are computed once per
+    matrix and stored in a single matrix.
+
+    Returns:
+      A dictionary from tuples of ids to rows and the matrix of averages.
+    """
+    if self._averages is None:
+      self._averages = self._average_rows()
+    return self._averages
+
+  def _average_rows(self, chunk_size=CHUNK_SIZE):
+    groups = set()
+    vocabulary = self.vocabulary
+    # Expansions wrap the vocabulary they expand.
+    while hasattr(vocabulary, "aux_word_id"):
+      groups.update(ids for ids in vocabulary.aux_word_id.values()
+                    if isinstance(ids, tuple))
+      vocabulary = vocabulary._vocab
+    groups = sorted(groups)
+    dtype = np.result_type(self.vectors, np.float32)
+    averages = np.empty((len(groups), self.shape[1]), dtype=dtype)
+    for start in xrange(0, len(groups), chunk_size):
+      chunk = groups[start:start + chunk_size]
+      sizes = np.fromiter((len(ids) for ids in chunk), dtype=np.int64,
+                          count=len(chunk))
+      ids = np.fromiter((i for ids in chunk for i in ids), dtype=np.int64,
+                        count=int(sizes.sum()))
+      offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+      sums = np.add.reduceat(self.vectors[ids], offsets, axis=0)
+      averages[start:start + len(chunk)] = sums / sizes[:, None]
+    rows = {ids: row for row, ids in enumerate(groups)}
+    return rows, averages
+
+  def _average(self, ids):
+    """Return the average of the vectors `ids`."""
+    rows, averages = self.averages
+    if ids in rows:
+      return averages[rows[ids]]
+    # Words that are only approximated on lookup are not precomputed.
+    return self.vectors[list(ids)].mean(axis=0).astype(averages.dtype)
+
   def __getitem__(self, k):
-    return self.vectors[self.vocabulary[k]]
+    id_ = self.vocabulary[k]
+    if isinstance(id_, tuple):
+      return self._average(id_)
+    return self.vectors[id_]
 
   def __contains__(self, k):
     return k in self.vocabulary
@@ -68,7 +156,11 @@ class Embedding(object):
     return self.vectors.shape
 
   def apply_expansion(self, expansion):
-    """Apply a vocabulary expansion to the current emebddings."""
+    """Apply a vocabulary expansion to the current emebddings.
+
+    The vectors of the words that the expansion maps to several ids are
+    averaged on first use, see `averages`.
+    """
     self.vocabulary = expansion(self.vocabulary)
 
   def get(self, k, default=None):
@@ -77,29 +169,264 @@ class Embedding(object):
     except KeyError as e:
       return default
 
-  def most_frequent(self, k, inplace=False):
-    """Only most frequent k words to be included in the embeddings."""
-    vocabulary = self.vocabulary.most_frequent(k)
-    vectors = np.asarray([self[w] for w in vocabulary])
+  def _select(self, vocabulary, inplace=False, copy=True):
+    """Return the embeddings of the words of `vocabulary`.
+
+    The rows are gathered with a single index array, see `lookup`. When they
+    are the first rows of the matrix and `copy` is False, the new vectors are
+    a view.
+    """
+    ids = self._word_ids(vocabulary.words)
+    if ids == list(range(len(ids))):
+      vectors = self.vectors[:len(ids)]
+      if copy:
+        vectors = vectors.copy()
+    else:
+      vectors = self._rows(ids)
     if inplace:
       self.vocabulary = vocabulary
       self.vectors = vectors
       return self
     return Embedding(vectors=vectors, vocabulary=vocabulary)
 
-  def normalize_words(self, ord=2, inplace=False):
+  def most_frequent(self, k, inplace=False, copy=True):
+    """Only most frequent k words to be included in the embeddings.
+
+    Args:
+      k (integer): number of words to keep.
+      inplace (boolean): change these embeddings instead of returning new ones.
+      copy (boolean): copy the vectors of the words. Otherwise the vectors
+                      are a view of the first `k` rows of the matrix, which
+                      keeps the whole matrix alive.
+    """
+    vocabulary = self.vocabulary.most_frequent(k)
+    return self._select(vocabulary, inplace=inplace, copy=copy)
+
+  def subset(self, words, inplace=False):
+    """Only `words` to be included in the embeddings.
+
+    The words keep the given order, unless the vocabulary is counted. A
+    `CountedVocabulary` keeps its words ordered by decreasing count, so the
+    words and their counts are ordered that way instead.
+
+    Args:
+      words (list): strings, every one has to be in the vocabulary.
+      inplace (boolean): change these embeddings instead of returning new ones.
+    """
+    words = list(OrderedDict.fromkeys(words))
+    if isinstance(self.vocabulary, CountedVocabulary):
+      counts = self.vocabulary.word_count
+      vocabulary = CountedVocabulary(word_count=[(w, counts[w]) for w in words])
+    else:
+      vocabulary = OrderedVocabulary(words=words)
+    return self._select(vocabulary, inplace=inplace)
+
+  def normalize_words(self, ord=2, inplace=False, chunk_size=CHUNK_SIZE):
     """Normalize embeddings matrix row-wise.
 
+    The rows are divided in chunks of `chunk_size`, so normalizing in place
+    does not allocate a second matrix. Rows of zeros are kept as they are.
+
     Args:
       ord: normalization order. Possible values {1, 2, 'inf', '-inf'}
+      inplace (boolean): overwrite the vectors instead of returning a
+                         normalized copy of the embeddings.
+      chunk_size (integer): number of rows normalized at once.
     """
     if ord == 2:
       ord = None # numpy uses this flag to indicate l2.
-    vectors = self.vectors.T / np.linalg.norm(self.vectors, ord, axis=1)
+    norms = self.norms if ord is None else self._row_norms(ord, chunk_size)
+    vectors = self.vectors
+    if not inplace:
+      normalized = np.empty(vectors.shape, dtype=norms.dtype)
+    elif vectors.flags.writeable and vectors.dtype == norms.dtype:
+      normalized = vectors
+    else:
+      # Read only or integer vectors can not hold the result.
+      normalized = np.array(vectors, dtype=norms.dtype)
+    nonzero = norms != 0
+    divisors = np.where(nonzero, norms, 1)
+    for start in xrange(0, len(vectors), chunk_size):
+      stop = start + chunk_size
+      np.divide(vectors[start:stop], divisors[start:stop, None],
+                out=normalized[start:stop])
+
     if inplace:
-      self.vectors = vectors.T
-      return self
-    return Embedding(vectors=vectors.T, vocabulary=self.vocabulary)
+      self.vectors = normalized
+      e = self
+    else:
+      e = Embedding(vectors=normalized, vocabulary=self.vocabulary)
+    if ord is None:
+      e._norms = nonzero.astype(norms.dtype)
+    return e
+
+  def _word_ids(self, words):
+    """Return the ids of `words`, tuples of ids for averaged words."""
+    return [self.vocabulary[w] for w in words]
+
+  def lookup(self, words):
+    """Return the vectors of `words` as the rows of a matrix.
+
+    Args:
+      words (list): strings.
+    """
+    return self._rows(self._word_ids(words))
+
+  def _rows(self, ids):
+    """Return the vectors of `ids` as the rows of a matrix.
+
+    Args:
+      ids (list): ids of rows, or tuples of ids of rows to be averaged.
+    """
+    averaged = [i for i, id_ in enumerate(ids) if isinstance(id_, tuple)]
+    if not averaged:
+      return self.vectors[np.asarray(ids, dtype=np.int64)]
+    single = np.ones(len(ids), dtype=bool)
+    single[averaged] = False
+    rows, averages = self.averages
+    vectors = np.empty((len(ids), self.shape[1]), dtype=averages.dtype)
+    vectors[single] = self.vectors[[id_ for id_ in ids
+                                    if not isinstance(id_, tuple)]]
+    for i in averaged:
+      vectors[i] = self._average(ids[i])
+    return vectors
+
+  def encode(self, docs, pooling="mean"):
+    """Return the vectors of the documents `docs` as the rows of a matrix.
+
+    Every distinct token of all documents is looked up once and the token
+    vectors are pooled per document with a single reduction. Tokens that are
+    not in the vocabulary are skipped, documents without any known token are
+    encoded as zero vectors.
+
+    Args:
+      docs (list): documents, every one a list of strings.
+      pooling (string): `mean` or `max` of the token vectors, or `tfidf` for
+                        their mean weighted by the inverse document frequency
+                        of the tokens within `docs`.
+
+    Returns:
+      numpy array of shape (len(docs), dimension).
+    """
+    if pooling not in ("mean", "max", "tfidf"):
+      raise ValueError("Unknown pooling {}, expected mean, max or "
+                       "tfidf".format(pooling))
+    docs = [list(doc) for doc in docs]
+    lengths = np.fromiter((len(doc) for doc in docs), dtype=np.int64,
+                          count=len(docs))
+    index = {}
+    columns = np.fromiter((index.setdefault(t, len(index))
+                           for doc in docs for t in doc),
+                          dtype=np.int64, count=int(lengths.sum()))
+    words = sorted(index, key=index.get)
+    known = np.fromiter((w in self for w in words), dtype=bool,
+                        count=len(words))
+    rows = np.cumsum(known) - 1
+    doc_ids = np.repeat(np.arange(len(docs)), lengths)
+    keep = known[columns]
+    columns, doc_ids = columns[keep], doc_ids[keep]
+    lengths = np.bincount(doc_ids, minlength=len(docs))
+
+    encoded = np.zeros((len(docs), self.shape[1]),
+                       dtype=np.result_type(self.vectors, np.float32))
+    nonempty = lengths > 0
+    if not nonempty.any():
+      return encoded
+    vectors = self.lookup([w for w, k in zip(words, known) if k])
+    tokens = vectors[rows[columns]].astype(encoded.dtype, copy=False)
+    offsets = (np.cumsum(lengths) - lengths)[nonempty]
+    if pooling == "max":
+      pooled = np.maximum.reduceat(tokens, offsets, axis=0)
+    elif pooling == "mean":
+      pooled = np.add.reduceat(tokens, offsets, axis=0)
+      pooled /= lengths[nonempty, None]
+    else:
+      pairs = np.unique(doc_ids * len(words) + columns)
+      df = np.bincount(pairs % len(words), minlength=len(words))
+      idf = np.log((1. + len(docs)) / (1. + df)) + 1
+      weights = idf[columns].astype(encoded.dtype)
+      pooled = np.add.reduceat(tokens * weights[:, None], offsets, axis=0)
+      pooled /= np.add.reduceat(weights, offsets)[:, None]
+    encoded[nonempty] = pooled
+    return encoded
+
+  @staticmethod
+  def _divisors(norms):
+    """Return `norms` with zeros replaced by ones."""
+    return np.where(norms == 0, 1, norms)
+
+  def similarity(self, words_a, words_b=None, metric="cosine"):
+    """Return the pairwise similarities between `words_a` and `words_b`.
+
+    The similarities are computed with a single matrix product.
+
+    Args:
+      words_a (list): strings.
+      words_b (list): strings, defaults to `words_a`.
+      metric (string): `cosine` or `dot` for the dot product.
+
+    Returns:
+      numpy array of shape (len(words_a), len(words_b)).
+    """
+    if metric not in ("cosine", "dot"):
+      raise ValueError("Unknown metric {}, expected cosine or dot".format(
+                       metric))
+    vectors_a = self.lookup(words_a)
+    vectors_b = vectors_a if words_b is None else self.lookup(words_b)
+    scores = np.dot(vectors_a, vectors_b.T)
+    if metric == "cosine":
+      norms_a = np.linalg.norm(vectors_a, axis=1)
+      norms_b = np.linalg.norm(vectors_b, axis=1)
+      scores /= np.outer(self._divisors(norms_a), self._divisors(norms_b))
+    return scores
+
+  def most_similar(self, positive=(), negative=(), top_k=10, metric="cosine"):
+    """Return the words closest to the sum of `positive` minus `negative`.
+
+    With `positive=["king", "woman"]` and `negative=["man"]` this answers the
+    analogy man : king :: woman : ?. Every vector of the embeddings is scored
+    with a single matrix-vector product and the query words are never
+    returned.
+
+    Args:
+      positive (list): strings that contribute positively.
+      negative (list): strings that contribute negatively.
+      top_k (integer): decides how many words to report.
+      metric (string): `cosine` or `dot` for the dot product.
+
+    Returns:
+      A list of (word, similarity) tuples, the most similar first.
+    """
+    if isinstance(positive, string_types):
+      positive = [positive]
+    if isinstance(negative, string_types):
+      negative = [negative]
+    if metric not in ("cosine", "dot"):
+      raise ValueError("Unknown metric {}, expected cosine or dot".format(
+                       metric))
+    ids = self._word_ids(list(positive) + list(negative))
+    if not ids:
+      raise ValueError("At least one positive or negative word is needed")
+    weights = np.ones(len(ids))
+    weights[len(positive):] = -1
+    vectors = self._rows(ids)
+    if metric == "cosine":
+      norms = np.linalg.norm(vectors, axis=1)
+      vectors = vectors / self._divisors(norms)[:, None]
+    query = np.dot(weights, vectors).astype(self.vectors.dtype)
+
+    scores = np.dot(self.vectors, query)
+    if metric == "cosine":
+      scores /= self._divisors(self.norms) * (np.linalg.norm(query) or 1)
+    # Averaged words have no row of their own to be excluded.
+    excluded = set(id_ for id_ in ids if not isinstance(id_, tuple))
+    scores[list(excluded)] = -np.inf
+    top_k = min(top_k, len(scores) - len(excluded))
+    if top_k <= 0:
+      return []
+    top_ids = np.argpartition(-scores, top_k - 1)[:top_k]
+    top_ids = top_ids[np.argsort(-scores[top_ids], kind="mergesort")]
+    return [(self.vocabulary.id_word[i], float(scores[i])) for i in top_ids]
 
   def nearest_neighbors(self, word, top_k=10):
     """Return the nearest k words to the given `word`.
@@ -140,7 +467,7 @@ class Embedding(object):
     """
 
     point = self[word]
-    vectors = np.asarray([self[w] for w in words])
+    vectors = self.lookup(words)
     diff = vectors - point
     distances = np.linalg.norm(diff, axis=1)
     return distances
@@ -165,58 +492,74 @@ class Embedding(object):
         counts[word] = int(count)
     return CountedVocabulary(word_count=counts)
 
+  @staticmethod
+  def _word2vec_header(fin):
+    """Read the number of words and the dimension from a word2vec file."""
+    header = _decode(fin.readline())
+    vocab_size, layer1_size = list(map(int, header.split())) # throws for invalid file format
+    return vocab_size, layer1_size
+
+  @staticmethod
+  def _word2vec_binary_rows(fin, vocab_size, layer1_size):
+    """Yield the words and the vectors of a binary word2vec file one by one."""
+    binary_len = np.dtype(float32).itemsize * layer1_size
+    for line_no in xrange(vocab_size):
+      # mixed text and binary: read text first, then binary
+      word = []
+      while True:
+        ch = fin.read(1)
+        if ch == b' ':
+          break
+        if ch != b'\n': # ignore newlines in front of words (some binary files have newline, some don't)
+          word.append(ch)
+      word = _decode(b''.join(word))
+      yield word, np.frombuffer(fin.read(binary_len), dtype=float32)
+
+  @staticmethod
+  def _word2vec_text_rows(fin, layer1_size):
+    """Yield the words and the vectors of a text word2vec file one by one."""
+    for line_no, line in enumerate(fin):
+      try:
+        parts = _decode(line).strip().split()
+      except TypeError as e:
+        parts = line.strip().split()
+      except Exception as e:
+        logger.warning("We ignored line number {} because of erros in parsing"
+                        "\n{}".format(line_no, e))
+        continue
+      # We differ from Gensim implementation.
+      # Our assumption that a difference of one happens because of having a
+      # space in the word.
+      if len(parts) == layer1_size + 1:
+        word, weights = parts[0], list(map(float32, parts[1:]))
+      elif len(parts) == layer1_size + 2:
+        word, weights = parts[:2], list(map(float32, parts[2:]))
+        word = u" ".join(word)
+      else:
+        logger.warning("We ignored line number {} because of unrecognized "
+                        "number of columns {}".format(line_no, parts[:-layer1_size]))
+        continue
+      yield word, weights
+
   @staticmethod
   def _from_word2vec_binary(fname):
     with _open(fname, 'rb') as fin:
       words = []
-      header = _decode(fin.readline())
-      vocab_size, layer1_size = list(map(int, header.split())) # throws for invalid file format
+      vocab_size, layer1_size = Embedding._word2vec_header(fin)
       vectors = np.zeros((vocab_size, layer1_size), dtype=float32)
-      binary_len = np.dtype(float32).itemsize * layer1_size
-      for line_no in xrange(vocab_size):
-        # mixed text and binary: read text first, then binary
-        word = []
-        while True:
-          ch = fin.read(1)
-          if ch == b' ':
-            break
-          if ch != b'\n': # ignore newlines in front of words (some binary files have newline, some don't)
-            word.append(ch)
-        word = _decode(b''.join(word))
-        index = line_no
+      rows = Embedding._word2vec_binary_rows(fin, vocab_size, layer1_size)
+      for index, (word, vector) in enumerate(rows):
         words.append(word)
-        vectors[index, :] = np.fromstring(fin.read(binary_len), dtype=float32)
+        vectors[index, :] = vector
       return words, vectors
 
   @staticmethod
   def _from_word2vec_text(fname):
     with _open(fname, 'rb') as fin:
       words = []
-      header = _decode(fin.readline())
-      vocab_size, layer1_size = list(map(int, header.split())) # throws for invalid file format
+      vocab_size, layer1_size = Embedding._word2vec_header(fin)
       vectors = []
-      for line_no, line in enumerate(fin):
-        try:
-          parts = _decode(line).strip().split()
-        except TypeError as e:
-          parts = line.strip().split()
-        except Exception as e:
-          logger.warning("We ignored line number {} because of erros in parsing"
-                          "\n{}".format(line_no, e))
-          continue
-        # We differ from Gensim implementation.
-        # Our assumption that a difference of one happens because of having a
-        # space in the word.
-        if len(parts) == layer1_size + 1:
-          word, weights = parts[0], list(map(float32, parts[1:]))
-        elif len(parts) == layer1_size + 2:
-          word, weights = parts[:2], list(map(float32, parts[2:]))
-          word = u" ".join(word)
-        else:
-          logger.warning("We ignored line number {} because of unrecognized "
-                          "number of columns {}".format(line_no, parts[:-layer1_size]))
-          continue
-        index = line_no
+      for word, weights in Embedding._word2vec_text_rows(fin, layer1_size):
         words.append(word)
         vectors.append(weights)
       vectors = np.asarray(vectors, dtype=np.float32)
@@ -291,6 +634,15 @@ class Embedding(object):
     vocabulary = OrderedVocabulary(words)
     return Embedding(vocabulary=vocabulary, vectors=vectors)
 
+  @staticmethod
+  def _vocabulary(voc):
+    """Rebuild a vocabulary out of the state returned by its `getstate`."""
+    if len(voc) == 2:
+      words, counts = voc
+      word_count = dict(zip(words, counts))
+      return CountedVocabulary(word_count=word_count)
+    return OrderedVocabulary(voc)
+
   @staticmethod
   def load(fname):
     """Load an embedding dump generated by `save`"""
@@ -301,14 +653,47 @@ class Embedding(object):
     else:
       state = pickle.loads(content, encoding='latin1')
     voc, vec = state
-    if len(voc) == 2:
-      words, counts = voc
-      word_count = dict(zip(words, counts))
-      vocab = CountedVocabulary(word_count=word_count)
-    else:
-      vocab = OrderedVocabulary(voc)
+    vocab = Embedding._vocabulary(voc)
     return Embedding(vocabulary=vocab, vectors=vec)
 
+  @staticmethod
+  def load_arrays(dirname, mmap_mode='r'):
+    """Load embeddings saved by `save_arrays`, memory mapping the vectors."""
+    with open(path.join(dirname, "vocabulary.pkl"), 'rb') as f:
+      voc = pickle.load(f)
+    vectors = np.load(path.join(dirname, "vectors.npy"), mmap_mode=mmap_mode)
+    return Embedding(vocabulary=Embedding._vocabulary(voc), vectors=vectors)
+
+  @staticmethod
+  def saved_time(dirname):
+    """Return the time the embeddings saved into `dirname` were written."""
+    return min(path.getmtime(path.join(dirname, f))
+               for f in ("vocabulary.pkl", "vectors.npy"))
+
+  def save_arrays(self, dirname):
+    """Save the vocabulary and the vectors as separate files into `dirname`.
+
+    The vectors are saved as a `.npy` file that `load_arrays` memory maps
+    instead of reading it. Every file is written to a temporary file first
+    and then renamed.
+    """
+    if not path.isdir(dirname):
+      os.makedirs(dirname)
+    writers = [("vectors.npy", lambda f: np.save(f, self.vectors)),
+               ("vocabulary.pkl",
+                lambda f: pickle.dump(self.vocabulary.getstate(), f,
+                                      protocol=pickle.HIGHEST_PROTOCOL))]
+    for name, write in writers:
+      fname = path.join(dirname, name)
+      tmp = "{}.{}.tmp".format(fname, os.getpid())
+      try:
+        with open(tmp, 'wb') as f:
+          write(f)
+        _replace(tmp, fname)
+      finally:
+        if path.exists(tmp):
+          os.remove(tmp)
+
   def save(self, fname):
     """Save a pickled version of the embedding into `fname`."""
 
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Defines embeddings whose vectors stay on disk in memory mapped shards."""
+
+from io import open
+import logging
+from os import path
+import os
+
+import numpy as np
+from numpy import float32
+
+from six import string_types
+from six.moves import xrange
+from six.moves import cPickle as pickle
+
+from .base import OrderedVocabulary
+from .embeddings import CHUNK_SIZE, Embedding
+from ..utils import _open, _replace
+
+
+logger = logging.getLogger(__name__)
+
+SHARD_NAME = "vectors.{:05d}.npy"
+"""File name of the shard of a given number."""
+
+
+def _save(fname, write):
+  """Call `write` with a temporary file and rename it to `fname`."""
+  tmp = "{}.{}.tmp".format(fname, os.getpid())
+  try:
+    with open(tmp, 'wb') as f:
+      write(f)
+    _replace(tmp, fname)
+  finally:
+    if path.exists(tmp):
+      os.remove(tmp)
+
+
+class ShardedEmbedding(object):
+  """Mapping a vocabulary to d-dimensional points stored in row shards.
+
+  The rows of the embeddings matrix are split into shards of consecutive rows
+  that are saved as `.npy` files and memory mapped. Only the vocabulary and,
+  once needed, the norms of the vectors are kept in memory. Operations over
+  all the vectors read one shard at a time.
+  """
+
+  def __init__(self, vocabulary, shards):
+    self.vocabulary = vocabulary
+    self.shards = list(shards)
+    sizes = [len(shard) for shard in self.shards]
+    self.offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    self._norms = None
+
+    if len(self.vocabulary) != self.offsets[-1]:
+      raise ValueError("Vocabulary has {} items but we have {} "
+                       "vectors".format(len(vocabulary), self.offsets[-1]))
+
+  def _shard_ids(self, ids):
+    """Return the numbers of the shards holding the rows `ids`."""
+    return np.searchsorted(self.offsets, ids, side="right") - 1
+
+  def __getitem__(self, k):
+    id_ = self.vocabulary[k]
+    shard = self._shard_ids(id_)
+    return self.shards[shard][id_ - self.offsets[shard]]
+
+  def __contains__(self, k):
+    return k in self.vocabulary
+
+  def __len__(self):
+    return len(self.vocabulary)
+
+  def __iter__(self):
+    for w in self.vocabulary:
+      yield w, self[w]
+
+  @property
+  def words(self):
+    return self.vocabulary.words
+
+  @property
+  def shape(self):
+    dimension = self.shards[0].shape[1] if self.shards else 0
+    return (len(self), dimension)
+
+  @property
+  def dtype(self):
+    return self.shards[0].dtype if self.shards else np.dtype(float32)
+
+  def get(self, k, default=None):
+    try:
+      return self[k]
+    except KeyError as e:
+      return default
+
+  @property
+  def norms(self):
+    """L2 norms of the vectors, computed once shard by shard."""
+    if self._norms is None:
+      norms = np.empty(len(self), dtype=np.result_type(self.dtype, float32))
+      for offset, shard in zip(self.offsets, self.shards):
+        norms[offset:offset + len(shard)] = np.linalg.norm(shard, axis=1)
+      self._norms = norms
+    return self._norms
+
+  def _ids(self, words):
+    """Return the ids of `words` as an array."""
+    words = list(words)
+    return np.fromiter((self.vocabulary[w] for w in words), dtype=np.int64,
+                       count=len(words))
+
+  def lookup(self, words):
+    """Return the vectors of `words` as the rows of a matrix.
+
+    Every shard is indexed once for all the words it holds.
+
+    Args:
+      words (list): strings.
+    """
+    ids = self._ids(words)
+    vectors = np.empty((len(ids), self.shape[1]), dtype=self.dtype)
+    shard_ids = self._shard_ids(ids)
+    for shard in np.unique(shard_ids):
+      rows = shard_ids == shard
+      vectors[rows] = self.shards[shard][ids[rows] - self.offsets[shard]]
+    return vectors
+
+  def _top(self, scores, top_k, exclude=()):
+    """Return the ids and the scores of the highest `scores` of all shards.
+
+    Only the best `top_k` candidates are kept while the shards are scored.
+
+    Args:
+      scores (function): maps a shard and its offset to the scores of its
+                         rows.
+      top_k (integer): number of ids to return.
+      exclude (list): ids that are never returned.
+    """
+    best_ids = np.empty(0, dtype=np.int64)
+    best = np.empty(0)
+    if top_k <= 0:
+      return best_ids, best
+    exclude = np.asarray(exclude, dtype=np.int64)
+    for offset, shard in zip(self.offsets, self.shards):
+      shard_scores = np.asarray(scores(shard, offset), dtype=np.float64)
+      excluded = exclude[(exclude >= offset) & (exclude < offset + len(shard))]
+      shard_scores[excluded - offset] = -np.inf
+      k = min(top_k, len(shard_scores))
+      if k == 0:
+        continue
+      candidates = np.argpartition(-shard_scores, k - 1)[:k]
+      best_ids = np.concatenate((best_ids, candidates + offset))
+      best = np.concatenate((best, shard_scores[candidates]))
+      if len(best) > top_k:
+        kept = np.argpartition(-best, top_k - 1)[:top_k]
+        best_ids, best = best_ids[kept], best[kept]
+    order = np.argsort(-best, kind="mergesort")
+    order = order[best[order] > -np.inf]
+    return best_ids[order], best[order]
+
+  def most_similar(self, positive=(), negative=(), top_k=10, metric="cosine"):
+    """Return the words closest to the sum of `positive` minus `negative`.
+
+    Works as `Embedding.most_similar`, scoring one shard at a time.
+
+    Args:
+      positive (list): strings that contribute positively.
+      negative (list): strings that contribute negatively.
+      top_k (integer): decides how many words to report.
+      metric (string): `cosine` or `dot` for the dot product.
+
+    Returns:
+      A list of (word, similarity) tuples, the most similar first.
+    """
+    if isinstance(positive, string_types):
+      positive = [positive]
+    if isinstance(negative, string_types):
+      negative = [negative]
+    if metric not in ("cosine", "dot"):
+      raise ValueError("Unknown metric {}, expected cosine or dot".format(
+                       metric))
+    words = list(positive) + list(negative)
+    if not words:
+      raise ValueError("At least one positive or negative word is needed")
+    ids = self._ids(words)
+    weights = np.ones(len(ids))
+    weights[len(positive):] = -1
+    vectors = self.lookup(words)
+    if metric == "cosine":
+      divisors = np.where(self.norms == 0, 1, self.norms)
+      vectors = vectors / divisors[ids][:, None]
+    query = np.dot(weights, vectors).astype(self.dtype)
+    query_norm = np.linalg.norm(query) or 1
+
+    def scores(shard, offset):
+      shard_scores = np.dot(shard, query)
+      if metric == "cosine":
+        shard_scores /= divisors[offset:offset + len(shard)] * query_norm
+      return shard_scores
+
+    top_ids, top_scores = self._top(scores, top_k, exclude=ids)
+    return [(self.vocabulary.id_word[i], float(score))
+            for i, score in zip(top_ids, top_scores)]
+
+  def nearest_neighbors(self, word, top_k=10):
+    """Return the nearest k words to the given `word`.
+
+    Args:
+      word (string): single word.
+      top_k (integer): decides how many neighbors to report.
+
+    Returns:
+      A list of words sorted by the distances. The closest is the first.
+
+    Note:
+      L2 metric is used to calculate distances.
+    """
+    point = np.array(self[word])
+    scores = lambda shard, offset: -np.linalg.norm(shard - point, axis=1)
+    top_ids, _ = self._top(scores, top_k, exclude=[self.vocabulary[word]])
+    return [self.vocabulary.id_word[i] for i in top_ids]
+
+  @staticmethod
+  def _write(dirname, vocabulary, blocks):
+    """Save every block of rows as a shard, then the vocabulary.
+
+    The vocabulary is written last, so a directory is only loaded once all
+    its shards are complete.
+
+    Args:
+      dirname (string): directory of the shards.
+      vocabulary (function): returns the vocabulary of the rows, called once
+                             all the blocks are written.
+      blocks (iterable): matrices of consecutive rows.
+    """
+    if not path.isdir(dirname):
+      os.makedirs(dirname)
+    count = 0
+    for block in blocks:
+      fname = path.join(dirname, SHARD_NAME.format(count))
+      _save(fname, lambda f: np.save(f, block))
+      count += 1
+    state = (vocabulary().getstate(), count)
+    _save(path.join(dirname, "index.pkl"),
+          lambda f: pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL))
+    logger.info("Saved {} shards into {}".format(count, dirname))
+
+  @staticmethod
+  def load(dirname, mmap_mode='r'):
+    """Load embeddings saved by `from_embedding` or `from_word2vec`."""
+    with open(path.join(dirname, "index.pkl"), 'rb') as f:
+      voc, count = pickle.load(f)
+    shards = [np.load(path.join(dirname, SHARD_NAME.format(i)),
+                      mmap_mode=mmap_mode) for i in xrange(count)]
+    return ShardedEmbedding(vocabulary=Embedding._vocabulary(voc),
+                            shards=shards)
+
+  @staticmethod
+  def from_embedding(embedding, dirname, shard_size=CHUNK_SIZE):
+    """Split the vectors of `embedding` into shards saved into `dirname`.
+
+    Args:
+      embedding (Embedding): the embeddings to split.
+      dirname (string): directory of the shards.
+      shard_size (integer): number of rows of every shard.
+    """
+    vectors = embedding.vectors
+    blocks = (vectors[start:start + shard_size]
+              for start in xrange(0, len(vectors), shard_size))
+    ShardedEmbedding._write(dirname, lambda: embedding.vocabulary, blocks)
+    return ShardedEmbedding.load(dirname)
+
+  @staticmethod
+  def from_word2vec(fname, dirname, fvocab=None, binary=False,
+                    shard_size=CHUNK_SIZE):
+    """Convert a word2vec file into shards saved into `dirname`.
+
+    The file is read row by row and at most one shard is kept in memory, so
+    the embeddings can be larger than the memory available.
+
+    Args:
+      fname (string): word2vec file, see `Embedding.from_word2vec`.
+      dirname (string): directory of the shards.
+      fvocab (string): word counts generated by `-save-vocab`.
+      binary (boolean): whether the file is in the binary word2vec format.
+      shard_size (integer): number of rows of every shard.
+    """
+    words = []
+
+    def blocks(rows, layer1_size):
+      block = np.empty((shard_size, layer1_size), dtype=float32)
+      filled = 0
+      for word, vector in rows:
+        words.append(word)
+        block[filled] = vector
+        filled += 1
+        if filled == shard_size:
+          yield block
+          filled = 0
+      if filled:
+        yield block[:filled]
+
+    def vocabulary():
+      if fvocab is not None:
+        logger.info("loading word counts from %s" % (fvocab))
+        return Embedding.from_word2vec_vocab(fvocab)
+      return OrderedVocabulary(words=words)
+
+    logger.info("loading projection weights from %s" % (fname))
+    with _open(fname, 'rb') as fin:
+      vocab_size, layer1_size = Embedding._word2vec_header(fin)
+      if binary:
+        rows = Embedding._word2vec_binary_rows(fin, vocab_size, layer1_size)
+      else:
+        rows = Embedding._word2vec_text_rows(fin, layer1_size)
+      ShardedEmbedding._write(dirname, vocabulary, blocks(rows, layer1_size))
+    return ShardedEmbedding.load(dirname)
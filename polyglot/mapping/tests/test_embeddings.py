@@ -3,11 +3,18 @@
 
 """Test basic embedding utilities."""
 
+import os
+import shutil
+import tempfile
 import unittest
+from ..base import CountedVocabulary, OrderedVocabulary
 from ..embeddings import Embedding
+from ..expansion import CaseExpander, DigitExpander
 
 from io import StringIO
 
+import numpy as np
+
 word2vec_dump = u"""
 9 5
 </s> 0.001329 -0.000965 -0.001856 -0.000425 -0.000381 
@@ -40,6 +47,26 @@ class EmbeddingTest(unittest.TestCase):
     self.assertEqual(model.words, self.words[:3])
     self.assertEqual(model.shape, (3, 5))
 
+  def test_most_frequent_view(self):
+    model = self.model.most_frequent(4, copy=False)
+    self.assertTrue(np.shares_memory(model.vectors, self.model.vectors))
+    copied = self.model.most_frequent(4)
+    self.assertFalse(np.shares_memory(copied.vectors, self.model.vectors))
+    np.testing.assert_array_equal(copied.vectors, self.model.vectors[:4])
+
+  def test_subset(self):
+    model = self.model.subset([u"a", u"the", u"a"])
+    self.assertEqual(model.words, [u"a", u"the"])
+    np.testing.assert_array_equal(model[u"the"], self.model[u"the"])
+    counted = Embedding(CountedVocabulary(word_count={u"x": 1, u"y": 5}),
+                        np.array([[0., 1.], [1., 0.]]))
+    model = counted.subset([u"x", u"y"], inplace=True)
+    self.assertIs(model, counted)
+    # Counted vocabularies are ordered by count, not by the given order.
+    self.assertEqual(model.words, [u"y", u"x"])
+    self.assertEqual(model.vocabulary.word_count[u"y"], 5)
+    np.testing.assert_array_equal(model[u"x"], [1., 0.])
+
   def test_model_shape(self):
     self.assertEqual(self.model.shape, (9, 5))
 
@@ -59,6 +86,119 @@ class EmbeddingTest(unittest.TestCase):
     model = self.model.normalize_words()
     norms = (model.vectors ** 2).sum(axis=1)
     _ = [self.assertAlmostEqual(x,y, places=6) for x,y in zip(norms, [1.]*model.shape[0])]
+
+  def test_norm_inplace(self):
+    self.model.vectors[1] = 0
+    vectors = self.model.vectors
+    expected = self.model.normalize_words(chunk_size=4).vectors
+    model = self.model.normalize_words(inplace=True, chunk_size=4)
+    self.assertIs(model, self.model)
+    self.assertIs(model.vectors, vectors)
+    np.testing.assert_allclose(model.vectors, expected)
+    np.testing.assert_array_equal(model.vectors[1], 0)
+    np.testing.assert_allclose(model.norms, [1, 0] + [1] * 7, rtol=1e-6)
+
+  def test_cached_norms(self):
+    norms = self.model.norms
+    self.assertIs(self.model.norms, norms)
+    np.testing.assert_allclose(norms, np.linalg.norm(self.model.vectors, axis=1))
+    self.model.vectors = self.model.vectors * 2
+    np.testing.assert_allclose(self.model.norms, 2 * norms, rtol=1e-6)
+
+  def test_lookup(self):
+    np.testing.assert_array_equal(self.model.lookup([u"of", u"a"]),
+                                  [self.model[u"of"], self.model[u"a"]])
+    self.assertRaises(KeyError, self.model.lookup, [u"missing"])
+
+  def test_average_expansion(self):
+    vectors = np.array([[1., 0.], [0., 1.], [2., 2.]], dtype=np.float32)
+    model = Embedding(OrderedVocabulary([u"the", u"The", u"a"]), vectors)
+    model.apply_expansion(lambda v: CaseExpander(v, strategy='average'))
+    np.testing.assert_allclose(model[u"THE"], [0.5, 0.5])
+    np.testing.assert_allclose(model[u"A"], [2., 2.])
+    self.assertEqual(model[u"THE"].dtype, np.float32)
+    np.testing.assert_allclose(model.lookup([u"THE", u"the", u"A"]),
+                               [[0.5, 0.5], [1., 0.], [2., 2.]])
+    model.apply_expansion(lambda v: DigitExpander(v, strategy='average'))
+    self.assertIn((0, 1), model.averages[0])
+    model.vectors = vectors * 2
+    np.testing.assert_allclose(model[u"THE"], [1., 1.])
+
+  def test_encode(self):
+    docs = [[u"the", u"of", u"the"], [], [u"unknown"], [u"a", u"of"]]
+    mean = self.model.encode(docs)
+    self.assertEqual(mean.shape, (4, 5))
+    expected = self.model.lookup([u"the", u"of", u"the"]).mean(axis=0)
+    np.testing.assert_allclose(mean[0], expected, rtol=1e-6)
+    np.testing.assert_array_equal(mean[1:3], np.zeros((2, 5)))
+    maximum = self.model.encode(docs, pooling="max")
+    np.testing.assert_allclose(maximum[3],
+                               self.model.lookup([u"a", u"of"]).max(axis=0))
+    tfidf = self.model.encode(docs, pooling="tfidf")
+    # "of" is in two documents, "the" and "a" in one.
+    weights = np.log(5. / np.array([2., 3., 2.])) + 1
+    vectors = self.model.lookup([u"the", u"of", u"the"])
+    expected = np.dot(weights, vectors) / weights.sum()
+    np.testing.assert_allclose(tfidf[0], expected, rtol=1e-5)
+    self.assertRaises(ValueError, self.model.encode, docs, pooling="sum")
+
+  def test_averaged_queries(self):
+    vectors = np.array([[1., 0.], [0., 1.], [1., 1.], [-1., 2.]])
+    model = Embedding(OrderedVocabulary([u"the", u"The", u"cat", u"dog"]),
+                      vectors)
+    model.apply_expansion(lambda v: CaseExpander(v, strategy='average'))
+    the = np.array([0.5, 0.5])
+    cosine = lambda a, b: np.dot(a, b) / np.linalg.norm(a) / np.linalg.norm(b)
+    np.testing.assert_allclose(model.similarity([u"THE"], [u"dog"]),
+                               [[cosine(the, vectors[3])]])
+    np.testing.assert_allclose(model.similarity([u"THE", u"cat"]),
+                               [[1., 1.], [1., 1.]])
+    similar = model.most_similar([u"THE"], top_k=4)
+    self.assertEqual(len(similar), 4)
+    self.assertEqual(similar[0], (u"cat", 1.))
+    self.assertAlmostEqual(dict(similar)[u"dog"], cosine(the, vectors[3]))
+    model = model.subset([u"THE", u"cat"])
+    self.assertEqual(model.words, [u"THE", u"cat"])
+    np.testing.assert_allclose(model[u"THE"], the)
+
+  def test_similarity(self):
+    words = [u"the", u"of", u"a"]
+    vectors = np.array([self.model[w] for w in words])
+    np.testing.assert_allclose(self.model.similarity(words, words[:2],
+                                                     metric="dot"),
+                               vectors.dot(vectors[:2].T), rtol=1e-5)
+    unit = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+    scores = self.model.similarity(words)
+    self.assertEqual(scores.shape, (3, 3))
+    np.testing.assert_allclose(scores, unit.dot(unit.T), rtol=1e-5)
+    self.assertRaises(ValueError, self.model.similarity, words, metric="l1")
+
+  def test_most_similar(self):
+    vectors = np.array([[1, 0], [0, 1], [1, 1], [2, 1], [-1, 0]],
+                       dtype=np.float32)
+    words = [u"man", u"woman", u"king", u"queen", u"apple"]
+    model = Embedding(OrderedVocabulary(words), vectors)
+    similar = model.most_similar(positive=[u"king", u"woman"],
+                                 negative=[u"man"], top_k=2)
+    self.assertEqual([w for w, _ in similar], [u"queen", u"apple"])
+    unit = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+    query = unit[2] + unit[1] - unit[0]
+    self.assertAlmostEqual(similar[0][1],
+                           unit[3].dot(query) / np.linalg.norm(query), places=5)
+    self.assertEqual(len(model.most_similar(u"man", top_k=10)), 4)
+
+  def test_save_arrays(self):
+    dirname = tempfile.mkdtemp()
+    try:
+      self.model.save_arrays(dirname)
+      model = Embedding.load_arrays(dirname)
+      self.assertEqual(model.words, self.words)
+      self.assertFalse(model.vectors.flags.writeable)
+      np.testing.assert_array_equal(model.vectors, self.model.vectors)
+      self.assertEqual(sorted(os.listdir(dirname)),
+                       ["vectors.npy", "vocabulary.pkl"])
+    finally:
+      shutil.rmtree(dirname)
     
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Test sharded embeddings."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+import numpy as np
+
+from ..embeddings import Embedding
+from ..sharded import ShardedEmbedding
+from .test_embeddings import word2vec_dump
+
+
+class ShardedEmbeddingTest(unittest.TestCase):
+  def setUp(self):
+    self.dirname = tempfile.mkdtemp()
+    self.model = Embedding.from_word2vec(StringIO(word2vec_dump))
+    self.sharded = ShardedEmbedding.from_word2vec(
+        StringIO(word2vec_dump), os.path.join(self.dirname, "text"),
+        shard_size=4)
+
+  def tearDown(self):
+    shutil.rmtree(self.dirname)
+
+  def test_shards(self):
+    self.assertEqual([len(s) for s in self.sharded.shards], [4, 4, 1])
+    self.assertIsInstance(self.sharded.shards[0], np.memmap)
+    self.assertEqual(self.sharded.shape, self.model.shape)
+    self.assertEqual(self.sharded.words, self.model.words)
+
+  def test_lookup(self):
+    for word in self.model.words:
+      np.testing.assert_array_equal(self.sharded[word], self.model[word])
+    words = [u"a", u"the", u"in", u"a"]
+    np.testing.assert_array_equal(self.sharded.lookup(words),
+                                  self.model.lookup(words))
+    self.assertIsNone(self.sharded.get(u"unknown"))
+
+  def test_most_similar(self):
+    for metric in ("cosine", "dot"):
+      expected = self.model.most_similar([u"of", u"a"], [u"in"], top_k=4,
+                                         metric=metric)
+      result = self.sharded.most_similar([u"of", u"a"], [u"in"], top_k=4,
+                                         metric=metric)
+      self.assertEqual([w for w, _ in result], [w for w, _ in expected])
+      np.testing.assert_allclose([s for _, s in result],
+                                 [s for _, s in expected], rtol=1e-5)
+    self.assertEqual(len(self.sharded.most_similar(u"the", top_k=20)), 8)
+
+  def test_nearest_neighbors(self):
+    self.assertEqual(self.sharded.nearest_neighbors(u"the", top_k=3),
+                     self.model.nearest_neighbors(u"the", top_k=3))
+
+  def test_from_embedding(self):
+    dirname = os.path.join(self.dirname, "embedding")
+    sharded = ShardedEmbedding.from_embedding(self.model, dirname,
+                                              shard_size=5)
+    self.assertEqual(len(sharded.shards), 2)
+    np.testing.assert_array_equal(sharded.lookup(self.model.words),
+                                  self.model.vectors)
+
+  def test_binary(self):
+    fname = os.path.join(self.dirname, "vectors.bin")
+    with open(fname, "wb") as f:
+      f.write(u"{} {}\n".format(*self.model.shape).encode("utf-8"))
+      for word, vector in self.model:
+        f.write(word.encode("utf-8") + b" " + vector.tobytes() + b"\n")
+    sharded = ShardedEmbedding.from_word2vec(
+        fname, os.path.join(self.dirname, "binary"), binary=True, shard_size=2)
+    self.assertEqual(sharded.words, self.model.words)
+    np.testing.assert_array_equal(sharded.lookup(self.model.words),
+                                  self.model.vectors)
+
+
+if __name__ == "__main__":
+  unittest.main()
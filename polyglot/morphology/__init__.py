@@ -0,0 +1,3 @@
+from .base import MorphemeSegmenter, get_morpheme_segmenter, segment_corpus
+
+__all__ = ["MorphemeSegmenter", "get_morpheme_segmenter", "segment_corpus"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Morphological analysis.
+
+Segmentation of words into morphemes using Morfessor models.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from ..load import load_morfessor_model, load_vocabulary, model_cache
+from ..utils import LRUCache
+
+
+class MorphemeSegmenter(object):
+  """Segment words into morphemes, remembering recent segmentations.
+
+  Word frequencies are Zipfian, so a bounded cache of segmentations answers
+  most of the words of a corpus without running the Viterbi search.
+  """
+
+  def __init__(self, lang="en", cache_size=100000, preload=0, model=None):
+    """
+    Args:
+      lang (string): language code of the words.
+      cache_size (integer): number of segmentations to be remembered.
+      preload (integer): number of the most frequent words of the language
+                         vocabulary to be segmented ahead.
+      model: Morfessor model, defaults to the model of `lang`.
+    """
+    self.lang = lang
+    self._model = model
+    self.cache = LRUCache(maxsize=cache_size)
+    if preload:
+      vocabulary = load_vocabulary(lang=lang).most_frequent(preload)
+      self.preload(vocabulary.words)
+
+  @property
+  def model(self):
+    """Morfessor model, fetched from the models cache unless given."""
+    if self._model is not None:
+      return self._model
+    return load_morfessor_model(lang=self.lang)
+
+  def _segment(self, word):
+    morphemes, score = self.model.viterbi_segment(word)
+    return tuple(morphemes)
+
+  def preload(self, words):
+    """Segment `words` ahead and keep their segmentations in the cache."""
+    for w in words:
+      self.cache[w] = self._segment(w)
+
+  def segment(self, word):
+    """Return the list of the morphemes of `word`."""
+    morphemes = self.cache.get(word)
+    if morphemes is None:
+      morphemes = self._segment(word)
+      self.cache[word] = morphemes
+    return list(morphemes)
+
+  def segment_many(self, words):
+    """Return the morphemes of every word of `words`, in the same order."""
+    return [self.segment(w) for w in words]
+
+  def stats(self):
+    """Return the size and hit statistics of the segmentations cache."""
+    return self.cache.stats()
+
+
+@model_cache.cached
+def get_morpheme_segmenter(lang="en"):
+  """Return a morpheme segmenter from the models cache."""
+  return MorphemeSegmenter(lang=lang)
+
+
+_worker_segmenter = None
+"""Segmenter of a `segment_corpus` worker process."""
+
+
+def _segmenter(lang, model):
+  """Return the segmenter of `lang`, using `model` if it is given."""
+  if model is None:
+    return get_morpheme_segmenter(lang=lang)
+  return MorphemeSegmenter(lang=lang, cache_size=0, model=model)
+
+
+def _init_worker(lang, model):
+  """Install the segmenter of a worker process.
+
+  Note:
+    This is a helper function for parallel execution of `segment_corpus`.
+    The model is sent once to every worker instead of with every job.
+  """
+  global _worker_segmenter
+  _worker_segmenter = _segmenter(lang, model)
+
+
+def _segment_types(words):
+  """Segment a list of distinct words with the segmenter of this worker.
+
+  Note:
+    This is a helper function for parallel execution of `segment_corpus`.
+  """
+  return _worker_segmenter.segment_many(words)
+
+
+def segment_corpus(lines, lang="en", workers=1, chunk_size=10000,
+                   cache_size=100000, model=None):
+  """Segment the whitespace separated words of `lines` into morphemes.
+
+  Lines are read in chunks. The distinct words of a chunk that were not seen
+  recently are segmented once, split across `workers` processes.
+
+  Args:
+    lines (iterable): lines of text.
+    lang (string): language code of the text.
+    workers (integer): number of parallel processes.
+    chunk_size (integer): number of lines read at once.
+    cache_size (integer): number of segmentations remembered across chunks.
+    model: Morfessor model, defaults to the model of `lang`. It is sent once
+           to every worker process, so it has to be picklable.
+
+  Returns:
+    Generator of lists of (word, morphemes) tuples, one list per line in the
+    order of `lines`.
+  """
+  lines = iter(lines)
+  known = LRUCache(maxsize=cache_size)
+  if workers > 1:
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_worker,
+                                   initargs=(lang, model))
+  else:
+    executor = None
+    segmenter = _segmenter(lang, model)
+  try:
+    while True:
+      chunk = [l.strip().split() for l in islice(lines, chunk_size)]
+      if not chunk:
+        break
+      segmentations = {}
+      types = set()
+      for w in set(w for words in chunk for w in words):
+        morphemes = known.get(w)
+        if morphemes is None:
+          types.add(w)
+        else:
+          segmentations[w] = morphemes
+      types = sorted(types)
+      if executor is None:
+        results = segmenter.segment_many(types)
+      else:
+        size = len(types) // workers + 1
+        jobs = [types[i:i+size] for i in range(0, len(types), size)]
+        results = [m for shard in executor.map(_segment_types, jobs)
+                   for m in shard]
+      for w, morphemes in zip(types, results):
+        known[w] = morphemes
+        segmentations[w] = morphemes
+      for words in chunk:
+        yield [(w, segmentations[w]) for w in words]
+  finally:
+    if executor is not None:
+      executor.shutdown()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Test morpheme segmentation."""
+
+import unittest
+
+from ..base import MorphemeSegmenter, segment_corpus
+
+
+class SuffixModel(object):
+  """Splits the last two characters of a word and counts the searches."""
+
+  def __init__(self):
+    self.calls = 0
+
+  def viterbi_segment(self, word):
+    self.calls += 1
+    if len(word) > 3:
+      return [word[:-2], word[-2:]], 1.0
+    return [word], 1.0
+
+
+class PickleCountingModel(SuffixModel):
+  """Counts how many times it is pickled in this process."""
+
+  pickled = 0
+
+  def __getstate__(self):
+    PickleCountingModel.pickled += 1
+    return self.__dict__
+
+
+class MorphemeSegmenterTest(unittest.TestCase):
+  def setUp(self):
+    self.model = SuffixModel()
+    self.segmenter = MorphemeSegmenter(lang="xx", cache_size=2,
+                                       model=self.model)
+
+  def test_segment(self):
+    self.assertEqual(self.segmenter.segment(u"walked"), [u"walk", u"ed"])
+    self.assertEqual(self.segmenter.segment(u"the"), [u"the"])
+
+  def test_cache(self):
+    words = [u"walked", u"walked", u"talked", u"walked"]
+    self.assertEqual(self.segmenter.segment_many(words)[-1], [u"walk", u"ed"])
+    self.assertEqual(self.model.calls, 2)
+    stats = self.segmenter.stats()
+    self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+
+  def test_bounded(self):
+    self.segmenter.segment_many([u"a", u"b", u"c", u"a"])
+    self.assertEqual(self.segmenter.stats()["size"], 2)
+    self.assertEqual(self.model.calls, 4)
+
+  def test_preload(self):
+    self.segmenter.preload([u"walked"])
+    self.segmenter.segment(u"walked")
+    self.assertEqual(self.segmenter.stats()["hits"], 1)
+    self.assertEqual(self.model.calls, 1)
+
+
+class SegmentCorpusTest(unittest.TestCase):
+  def setUp(self):
+    self.model = SuffixModel()
+    self.lines = [u"walked the dog\n", u"\n", u"the dog walked\n", u"dog"]
+
+  def test_order(self):
+    annotated = list(segment_corpus(self.lines, lang="xx", chunk_size=2,
+                                    model=self.model))
+    self.assertEqual(len(annotated), 4)
+    self.assertEqual(annotated[0][0], (u"walked", [u"walk", u"ed"]))
+    self.assertEqual(annotated[1], [])
+    self.assertEqual([w for w, _ in annotated[2]], [u"the", u"dog", u"walked"])
+    self.assertEqual(self.model.calls, 3)
+
+  def test_workers(self):
+    expected = list(segment_corpus(self.lines, lang="xx", model=self.model))
+    annotated = list(segment_corpus(self.lines, lang="xx", workers=2,
+                                    chunk_size=2, model=self.model))
+    self.assertEqual(annotated, expected)
+
+  def test_model_sent_once_per_worker(self):
+    PickleCountingModel.pickled = 0
+    lines = [u"w{}".format(i) for i in range(20)]
+    annotated = list(segment_corpus(lines, lang="xx", workers=2, chunk_size=1,
+                                    model=PickleCountingModel()))
+    self.assertEqual(len(annotated), 20)
+    self.assertLessEqual(PickleCountingModel.pickled, 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
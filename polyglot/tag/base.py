@@ -11,8 +11,8 @@ Named entity Recognition extractors (NER) Detect three types of entities: {Perso
 import numpy as np
 from six.moves import range
 
-from ..decorators import memoize
 from ..load import load_embeddings, load_ner_model, load_pos_model, load_unified_pos_model
+from ..load import model_cache
 
 
 NER_ID_TAG = {0: u'O', 1: u'I-PER', 2: u'I-LOC', 3: u'I-ORG'}
@@ -175,17 +175,17 @@ class TransferPOSTagger(TaggerBase):
     return predict_proba
 
 
-@memoize
+@model_cache.cached
 def get_pos_tagger(lang='en'):
   """Return a POS tagger from the models cache."""
   return POSTagger(lang=lang)
 
-@memoize
+@model_cache.cached
 def get_transfer_pos_tagger(lang='en'):
   """Return a Transfer POS tagger from the models cache."""
   return TransferPOSTagger(lang=lang)
 
-@memoize
+@model_cache.cached
 def get_ner_tagger(lang='en'):
   """Return a NER tagger from the models cache."""
   return NEChunker(lang=lang)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Test caching decorators."""
+
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from ..decorators import ModelCache, estimate_size, memoize
+
+
+def concurrently(func, n=8):
+  results = []
+  threads = [threading.Thread(target=lambda: results.append(func()))
+             for _ in range(n)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  return results
+
+
+class EstimateSizeTest(unittest.TestCase):
+  def test_arrays(self):
+    array = np.zeros((100, 10), dtype=np.float64)
+    self.assertGreaterEqual(estimate_size(array), array.nbytes)
+    self.assertGreaterEqual(estimate_size({"W": array, "b": array[0]}),
+                            array.nbytes)
+    self.assertLess(estimate_size({"W": array, "b": array[0]}),
+                    2 * array.nbytes)
+
+  def test_exclude(self):
+    array = np.zeros(1000)
+    self.assertLess(estimate_size([array], exclude=[array]), array.nbytes)
+
+
+class ModelCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.cache = ModelCache(budget=20000)
+    self.loads = []
+
+    @self.cache.cached
+    def load(lang="en", size=1000):
+      self.loads.append(lang)
+      return np.zeros(size)
+
+    self.load = load
+
+  def test_keys(self):
+    self.assertIs(self.load("de"), self.load(lang="de"))
+    self.assertIs(self.load("de", 1000), self.load(size=1000, lang="de"))
+    self.assertEqual(self.loads, ["de"])
+
+  def test_eviction(self):
+    self.load("de")
+    self.load("fr")
+    self.load("de")
+    self.load("es")
+    self.assertEqual([lang for _, lang, _, _ in self.cache.resident()],
+                     ["de", "es"])
+    self.assertLessEqual(self.cache.size, self.cache.budget)
+
+  def test_pinning(self):
+    self.cache.pin("fr")
+    self.load("fr")
+    self.load("de")
+    self.load("es")
+    resident = self.cache.resident()
+    self.assertEqual([lang for _, lang, _, _ in resident], ["fr", "es"])
+    self.assertTrue(resident[0][3])
+    self.cache.unpin("fr")
+    self.cache.set_budget(10000)
+    self.assertEqual([lang for _, lang, _, _ in self.cache.resident()],
+                     ["es"])
+
+  def test_pinning_several_languages(self):
+    @self.cache.cached(lang=("source", "target"))
+    def pair(source="en", target="en"):
+      return np.zeros(1000)
+
+    self.cache.pin("fr")
+    pair("ar", "fr")
+    self.load("de")
+    self.load("es")
+    resident = self.cache.resident()
+    self.assertEqual([lang for _, lang, _, _ in resident],
+                     [("ar", "fr"), "es"])
+    self.assertTrue(resident[0][3])
+
+  def test_oversized(self):
+    model = self.load("de", size=10000)
+    self.assertEqual(len(self.cache), 1)
+    self.assertIs(self.load("de", size=10000), model)
+
+  def test_shared_memory(self):
+    @self.cache.cached
+    def tagger(lang="en"):
+      return {"embeddings": self.load(lang, size=1000), "W": np.zeros(10)}
+
+    tagger("de")
+    key = ("load", ("lang", "de"), ("size", 1000))
+    before = self.cache.size
+    self.cache.discard(key)
+    self.assertGreater(self.cache.size, before - 4000)
+    self.assertGreaterEqual(self.cache.resident()[0][2], 8000)
+
+  def test_single_flight(self):
+    @self.cache.cached
+    def slow(lang="en"):
+      self.loads.append(lang)
+      time.sleep(0.05)
+      return np.zeros(10)
+
+    results = concurrently(lambda: slow("de"))
+    self.assertEqual(self.loads, ["de"])
+    self.assertTrue(all(r is results[0] for r in results))
+    self.assertGreater(self.cache.timings[("slow", ("lang", "de"))], 0.04)
+
+  def test_failed_load(self):
+    @self.cache.cached
+    def broken(lang="en"):
+      self.loads.append(lang)
+      raise ValueError(lang)
+
+    self.assertRaises(ValueError, broken, "de")
+    self.assertRaises(ValueError, broken, "de")
+    self.assertEqual(self.loads, ["de", "de"])
+
+
+class MemoizeTest(unittest.TestCase):
+  def test_single_flight(self):
+    calls = []
+
+    @memoize
+    def slow(x):
+      calls.append(x)
+      time.sleep(0.05)
+      return [x]
+
+    results = concurrently(lambda: slow(1))
+    self.assertEqual(calls, [1])
+    self.assertTrue(all(r is results[0] for r in results))
+    self.assertEqual(list(slow.timings), [(1,)])
+
+
+if __name__ == "__main__":
+  unittest.main()
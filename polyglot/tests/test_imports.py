@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Test that heavy dependencies are imported on first use."""
+
+import subprocess
+import sys
+import unittest
+
+
+def imported_modules(statement, modules):
+  """Return which of `modules` are loaded after running `statement`."""
+  code = ("import sys\n{}\n"
+          "print(' '.join(m for m in {!r} if m in sys.modules))").format(
+            statement, modules)
+  output = subprocess.check_output([sys.executable, "-c", code])
+  return output.decode("utf-8").split()
+
+
+class LazyImportTest(unittest.TestCase):
+  heavy = ["icu", "pycld2", "morfessor", "polyglot.downloader"]
+
+  def test_text(self):
+    self.assertEqual(imported_modules("import polyglot.text", self.heavy), [])
+
+  def test_command_line(self):
+    self.assertEqual(imported_modules("import polyglot.__main__", self.heavy),
+                     [])
+
+  def test_first_use(self):
+    statement = ("from polyglot.text import Text\n"
+                 "Text(u'Hello world.', hint_language_code='en').words")
+    self.assertEqual(imported_modules(statement, self.heavy), ["icu"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Test resource loaders."""
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import numpy as np
+from six.moves import cPickle as pickle
+
+from .. import load
+from ..load import _read_morfessor_model, locate_resource, preload
+from ..load import load_embeddings, model_cache
+from ..mapping import Embedding, OrderedVocabulary
+from ..utils import ResourceManifest
+
+segmentations = u"""# Morfessor segmentation
+3 walk + ing
+2 talk + ed
+5 walk
+""".encode("utf-8")
+
+
+class MorfessorModelTest(unittest.TestCase):
+  def test_segmentation_file(self):
+    model = _read_morfessor_model(segmentations)
+    morphemes, _ = model.viterbi_segment(u"walked")
+    self.assertEqual(morphemes, [u"walk", u"ed"])
+
+  def test_binary_model(self):
+    model = _read_morfessor_model(segmentations)
+    model = _read_morfessor_model(pickle.dumps(model))
+    morphemes, _ = model.viterbi_segment(u"talking")
+    self.assertEqual(morphemes, [u"talk", u"ing"])
+
+  def test_broken_binary_model(self):
+    content = pickle.dumps(_read_morfessor_model(segmentations))
+    self.assertRaises((pickle.UnpicklingError, EOFError), _read_morfessor_model,
+                      content[:-10])
+
+  def test_empty_segmentation_file(self):
+    model = _read_morfessor_model(b"")
+    self.assertEqual(model.get_compounds(), [])
+
+
+class PreloadTest(unittest.TestCase):
+  def test_report(self):
+    preloader = preload(["en", "ar"], tasks=["tokenize", "unknown"], wait=True)
+    report = preloader.report()
+    self.assertEqual([(l, t, s) for l, t, s, _, _ in report],
+                     [("en", "tokenize", "ready"), ("en", "unknown", "failed"),
+                      ("ar", "tokenize", "ready"), ("ar", "unknown", "failed")])
+    self.assertTrue(isinstance(report[1][4], ValueError))
+    self.assertFalse(preloader.ready())
+
+  def test_ready(self):
+    preloader = preload(["en"], tasks=["tokenize"])
+    self.assertTrue(preloader.wait(timeout=60))
+
+
+class SegmenterPreloadTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.polyglot_path = load.polyglot_path
+    load.polyglot_path = self.root
+    dirname = os.path.join(self.root, "morph2", "xx")
+    os.makedirs(dirname)
+    fname = os.path.join(self.root, "xx.morph")
+    with open(fname, "wb") as fh:
+      fh.write(segmentations)
+    with tarfile.open(os.path.join(dirname, "xx.morph.tar.bz2"), "w:bz2") as fh:
+      fh.add(fname, arcname="xx.morph")
+
+  def tearDown(self):
+    load.polyglot_path = self.polyglot_path
+    model_cache.clear()
+    shutil.rmtree(self.root)
+
+  def test_segmenter_model_loaded(self):
+    preloader = preload(["xx"], tasks=["segmenter"], warmup=False, wait=True)
+    self.assertTrue(preloader.ready())
+    shutil.rmtree(os.path.join(self.root, "morph2"))
+    from ..morphology import get_morpheme_segmenter
+    segmenter = get_morpheme_segmenter(lang="xx")
+    self.assertEqual(segmenter.segment(u"walked"), [u"walk", u"ed"])
+
+
+class LocateResourceTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.polyglot_path = load.polyglot_path
+    load.polyglot_path = self.root
+    os.makedirs(os.path.join(self.root, "task", "xx"))
+    self.filename = os.path.join(self.root, "task", "xx", "model.pkl")
+    with open(self.filename, "wb") as fh:
+      fh.write(b"model")
+
+  def tearDown(self):
+    load.polyglot_path = self.polyglot_path
+    shutil.rmtree(self.root)
+
+  def test_manifest(self):
+    self.assertEqual(locate_resource("task", "xx"), self.filename)
+    manifest = ResourceManifest(self.root)
+    self.assertEqual(manifest.locate("task.xx"), self.filename)
+    self.assertEqual(manifest.get("task.xx")["format"], "pkl")
+
+  def test_stale_entry(self):
+    locate_resource("task", "xx")
+    os.remove(self.filename)
+    moved = os.path.join(self.root, "task", "xx", "model2.pkl")
+    with open(moved, "wb") as fh:
+      fh.write(b"model")
+    self.assertEqual(locate_resource("task", "xx"), moved)
+    self.assertEqual(ResourceManifest(self.root).locate("task.xx"), moved)
+
+
+class NormalizedEmbeddingsTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.polyglot_path = load.polyglot_path
+    load.polyglot_path = self.root
+    os.makedirs(os.path.join(self.root, "embeddings2", "xx"))
+    vectors = np.arange(12, dtype=np.float32).reshape(4, 3)
+    e = Embedding(OrderedVocabulary([u"a", u"b", u"c", u"d"]), vectors)
+    fname = os.path.join(self.root, "embeddings.pkl")
+    e.save(fname)
+    archive = os.path.join(self.root, "embeddings2", "xx", "embeddings.tar.bz2")
+    with tarfile.open(archive, "w:bz2") as fh:
+      fh.add(fname, arcname="embeddings.pkl")
+
+  def tearDown(self):
+    load.polyglot_path = self.polyglot_path
+    model_cache.clear()
+    shutil.rmtree(self.root)
+
+  def test_saved_once(self):
+    e = load_embeddings(lang="xx", normalize=True)
+    np.testing.assert_allclose(np.linalg.norm(e.vectors[1:], axis=1), 1,
+                               rtol=1e-6)
+    model_cache.clear()
+    mapped = load_embeddings(lang="xx", normalize=True)
+    self.assertFalse(mapped.vectors.flags.writeable)
+    np.testing.assert_array_equal(mapped.vectors, e.vectors)
+    self.assertEqual(mapped[u"B"].tolist(), e[u"b"].tolist())
+
+
+if __name__ == "__main__":
+  unittest.main()
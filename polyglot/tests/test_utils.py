@@ -3,8 +3,15 @@
 
 """Test utility functions"""
 
+import io
+import os
+import shutil
+import tarfile
+import tempfile
 import unittest
-from ..utils import _decode
+from ..utils import _decode, _extract, LRUCache, ResourceManifest, SharedArrays
+
+import numpy as np
 
 from six import text_type as unicode
 
@@ -21,5 +28,150 @@ class UtilsTest(unittest.TestCase):
     self.assertEqual(_decode(u"foo"), expected)
     self.assertEqual(_decode(b"foo"), expected)
 
+  def test_lru_cache(self):
+    cache = LRUCache(maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    self.assertEqual(cache.get("a"), 1)
+    cache["c"] = 3
+    self.assertTrue("a" in cache)
+    self.assertFalse("b" in cache)
+    self.assertEqual(cache.get("b", 0), 0)
+    self.assertEqual(len(cache), 2)
+    self.assertEqual(cache.stats()["hits"], 1)
+    self.assertEqual(cache.stats()["misses"], 1)
+    self.assertAlmostEqual(cache.hit_rate, 0.5)
+
+
+def write_archive(fname, content):
+  with tarfile.open(fname, "w:bz2") as archive:
+    info = tarfile.TarInfo("member")
+    info.size = len(content)
+    archive.addfile(info, io.BytesIO(content))
+
+
+class ExtractTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(self.root, "task", "xx"))
+    self.archive = os.path.join(self.root, "task", "xx", "model.tar.bz2")
+    write_archive(self.archive, b"first")
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def test_extract_once(self):
+    target = _extract(self.archive, root=self.root)
+    self.assertEqual(target, os.path.join(self.root, "extracted", "task", "xx",
+                                          "model"))
+    with open(target, "rb") as fh:
+      self.assertEqual(fh.read(), b"first")
+    mtime = os.path.getmtime(target)
+    self.assertEqual(_extract(self.archive, root=self.root), target)
+    self.assertEqual(os.path.getmtime(target), mtime)
+
+  def test_stale_copy(self):
+    target = _extract(self.archive, root=self.root)
+    write_archive(self.archive, b"second version")
+    self.assertEqual(_extract(self.archive, root=self.root), target)
+    with open(target, "rb") as fh:
+      self.assertEqual(fh.read(), b"second version")
+
+  def test_truncated_copy(self):
+    target = _extract(self.archive, root=self.root)
+    with open(target, "wb") as fh:
+      fh.write(b"fir")
+    self.assertEqual(_extract(self.archive, root=self.root), target)
+    with open(target, "rb") as fh:
+      self.assertEqual(fh.read(), b"first")
+
+  def test_failed_extraction(self):
+    with open(self.archive, "wb") as fh:
+      fh.write(b"not an archive")
+    self.assertEqual(_extract(self.archive, root=self.root), None)
+    dirname = os.path.join(self.root, "extracted", "task", "xx")
+    self.assertEqual([f for f in os.listdir(dirname) if f.endswith(".tmp")],
+                     [])
+
+  def test_outside_root(self):
+    self.assertEqual(_extract(self.archive, root=tempfile.gettempdir() + "/x"),
+                     None)
+
+
+class ResourceManifestTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(self.root, "task", "xx"))
+    self.archive = os.path.join(self.root, "task", "xx", "model.tar.bz2")
+    write_archive(self.archive, b"content")
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def test_add(self):
+    manifest = ResourceManifest(self.root)
+    self.assertEqual(manifest.locate("task.xx"), None)
+    entry = manifest.add("task.xx", self.archive)
+    self.assertEqual(entry["path"], os.path.join("task", "xx", "model.tar.bz2"))
+    self.assertEqual(entry["format"], "tar.bz2")
+    self.assertEqual(entry["size"], os.path.getsize(self.archive))
+    self.assertEqual(ResourceManifest(self.root).locate("task.xx"),
+                     self.archive)
+
+  def test_discard(self):
+    manifest = ResourceManifest(self.root)
+    manifest.add("task.xx", self.archive)
+    manifest.discard("task.xx")
+    self.assertEqual(ResourceManifest(self.root).get("task.xx"), None)
+
+  def test_shared(self):
+    self.assertTrue(ResourceManifest.for_root(self.root) is
+                    ResourceManifest.for_root(self.root + os.sep))
+
+
+class SharedArraysTest(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.shared = SharedArrays(self.root, enabled=True, min_size=100)
+    self.array = np.arange(1000, dtype=np.float32).reshape(100, 10)
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def test_disabled(self):
+    self.shared.enabled = False
+    self.assertIs(self.shared.share("task/xx/W", self.array), self.array)
+    self.assertEqual(len(self.shared), 0)
+
+  def test_share(self):
+    shared = self.shared.share("task/xx/W", self.array)
+    self.assertTrue(isinstance(shared, np.memmap))
+    self.assertFalse(shared.flags.writeable)
+    np.testing.assert_array_equal(shared, self.array)
+    self.assertEqual(self.shared.registry(),
+                     [("task/xx/W", self.shared.filename("task/xx/W"),
+                       self.array.nbytes)])
+
+  def test_attach(self):
+    self.shared.share("task/xx/W", self.array)
+    other = SharedArrays(self.root)
+    np.testing.assert_array_equal(other.attach("task/xx/W"), self.array)
+
+  def test_changed_array(self):
+    self.shared.share("task/xx/W", self.array)
+    shared = self.shared.share("task/xx/W", self.array[:50])
+    self.assertEqual(shared.shape, (50, 10))
+
+  def test_share_all(self):
+    model = {"W": self.array, "b": np.zeros(3)}
+    shared = self.shared.share_all("task/xx", model)
+    self.assertTrue(isinstance(shared["W"], np.memmap))
+    self.assertIs(shared["b"], model["b"])
+    layers = self.shared.share_all("task/yy", [self.array, self.array])
+    self.assertEqual(sorted(name for name, _, _ in self.shared.registry()),
+                     ["task/xx/W", "task/yy/0", "task/yy/1"])
+    self.assertTrue(isinstance(layers, list))
+
+
 if __name__ == "__main__":
   unittest.main()
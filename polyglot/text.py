@@ -8,17 +8,15 @@ from collections import defaultdict
 import numpy as np
 
 from polyglot.base import Sequence, TextFile, TextFiles
-from polyglot.detect import Detector, Language
 from polyglot.decorators import cached_property
-from polyglot.downloader import Downloader
-from polyglot.load import load_embeddings, load_morfessor_model
 from polyglot.mapping import CountedVocabulary
 from polyglot.mixins import BlobComparableMixin, StringlikeMixin
-from polyglot.tag import get_pos_tagger, get_transfer_pos_tagger, get_ner_tagger
-from polyglot.tokenize import SentenceTokenizer, WordTokenizer
-from polyglot.transliteration import Transliterator
 from polyglot.utils import _print
 
+# Language detection, the model loaders, taggers, tokenizers and
+# transliteration pull in ICU, pycld2 and morfessor. They are imported by the
+# properties that need them, so importing this module stays cheap.
+
 from .mixins import basestring
 
 import six
@@ -45,10 +43,12 @@ class BaseBlob(StringlikeMixin, BlobComparableMixin):
 
   @cached_property
   def detected_languages(self):
+    from polyglot.detect import Detector
     return Detector(self.raw, quiet=True)
 
   @property
   def language(self):
+    from polyglot.detect import Language
     if self.hint_language_code is not None:
       self.__lang = Language.from_code(self.hint_language_code)
 
@@ -58,12 +58,13 @@ class BaseBlob(StringlikeMixin, BlobComparableMixin):
 
   @language.setter
   def language(self, value):
+    from polyglot.detect import Language
     self.__lang = Language.from_code(value)
 
   @property
   def word_tokenizer(self):
-    word_tokenizer = WordTokenizer(locale=self.language.code)
-    return word_tokenizer
+    from polyglot.tokenize import get_word_tokenizer
+    return get_word_tokenizer(locale=self.language.code)
 
   @property
   def words(self):
@@ -98,31 +99,57 @@ class BaseBlob(StringlikeMixin, BlobComparableMixin):
       return 0.0
     return sum(scores) / float(len(scores))
 
+  @property
+  def vector(self):
+    """Return the mean of the embeddings of the words of this text.
+
+    Words that are not in the embeddings are skipped.
+    """
+    from polyglot.load import load_embeddings
+    embeddings = load_embeddings(lang=self.language.code, type="sgns",
+                                 task="embeddings")
+    return embeddings.encode([self.words])[0]
+
   @cached_property
   def ne_chunker(self):
+    from polyglot.tag import get_ner_tagger
     return get_ner_tagger(lang=self.language.code)
 
   @cached_property
   def pos_tagger(self):
+    from polyglot.tag import get_pos_tagger
     return get_pos_tagger(lang=self.language.code)
 
   @cached_property
   def transfer_pos_tagger(self):
+    from polyglot.tag import get_transfer_pos_tagger
     return get_transfer_pos_tagger(lang=self.language.code)
 
   @cached_property
   def morpheme_analyzer(self):
+    from polyglot.load import load_morfessor_model
     return load_morfessor_model(lang=self.language.code)
 
   def transliterate(self, target_language="en"):
     """Transliterate the string to the target language."""
-    return WordList([w.transliterate(target_language) for w in self.words],
+    from polyglot.transliteration import get_transliterator
+    t = get_transliterator(source_lang=self.language.code,
+                           target_lang=target_language)
+    return WordList(t.transliterate_many(self.words),
                      language=target_language, parent=self)
 
   @cached_property
   def morphemes(self):
-    words, score = self.morpheme_analyzer.viterbi_segment(self.raw)
-    return WordList(words, language=self.language.code, parent=self)
+    """Return the morphemes of the blob words, in the order of the words.
+
+    Every distinct word is segmented once.
+    """
+    from polyglot.morphology import get_morpheme_segmenter
+    segmenter = get_morpheme_segmenter(lang=self.language.code)
+    types = list(set(self.words))
+    segmentations = dict(zip(types, segmenter.segment_many(types)))
+    morphemes = [m for w in self.words for m in segmentations[w]]
+    return WordList(morphemes, language=self.language.code, parent=self)
 
 
   @cached_property
@@ -282,15 +309,19 @@ class Word(unicode):
 
   @cached_property
   def morpheme_analyzer(self):
+    from polyglot.load import load_morfessor_model
     return load_morfessor_model(lang=self.language)
 
   @cached_property
   def morphemes(self):
-    words, score = self.morpheme_analyzer.viterbi_segment(self.string)
-    return WordList(words, parent=self, language=self.language)
+    from polyglot.morphology import get_morpheme_segmenter
+    segmenter = get_morpheme_segmenter(lang=self.language)
+    return WordList(segmenter.segment(self.string), parent=self,
+                    language=self.language)
 
   @cached_property
   def detected_languages(self):
+    from polyglot.detect import Detector
     return Detector(self.string, quiet=True)
 
   @property
@@ -305,18 +336,21 @@ class Word(unicode):
 
   @property
   def vector(self):
+    from polyglot.load import load_embeddings
     embeddings = load_embeddings(lang=self.language, type="sgns",
                                  task="embeddings")
     return embeddings[self.string]
 
   @property
   def neighbors(self):
+    from polyglot.load import load_embeddings
     embeddings = load_embeddings(lang=self.language, type="sgns",
                                  task="embeddings")
     return embeddings.nearest_neighbors(self.string)
 
   @property
   def polarity(self):
+    from polyglot.load import load_embeddings
     embeddings = load_embeddings(lang=self.language, type="", task="sentiment")
     return embeddings.get(self.string, [0])[0]
 
@@ -326,8 +360,9 @@ class Word(unicode):
 
   def transliterate(self, target_language="en"):
     """Transliterate the string to the target language."""
-    t = Transliterator(source_lang=self.language,
-                       target_lang=target_language)
+    from polyglot.transliteration import get_transliterator
+    t = get_transliterator(source_lang=self.language,
+                           target_lang=target_language)
     return t.transliterate(self.string)
 
 
@@ -550,7 +585,8 @@ class Text(BaseBlob):
     '''Returns a list of Sentence objects from the raw text.
     '''
     sentence_objects = []
-    sent_tokenizer = SentenceTokenizer(locale=self.language.code)
+    from polyglot.tokenize import get_sentence_tokenizer
+    sent_tokenizer = get_sentence_tokenizer(locale=self.language.code)
     seq = Sequence(self.raw)
     seq = sent_tokenizer.transform(seq)
     for start_index, end_index in zip(seq.idx[:-1], seq.idx[1:]):
@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from .base import WordTokenizer, SentenceTokenizer
+from .base import (WordTokenizer, SentenceTokenizer,
+                   get_word_tokenizer, get_sentence_tokenizer)
+from .stream import StreamSegmenter
 
 
 __all__ = ['WordTokenizer',
-           'SentenceTokenizer']
+           'SentenceTokenizer',
+           'get_word_tokenizer',
+           'get_sentence_tokenizer',
+           'StreamSegmenter']
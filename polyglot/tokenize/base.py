@@ -3,38 +3,166 @@
 
 """ Basic text segmenters."""
 
-from icu import Locale, BreakIterator
+import threading
+
+import numpy as np
+from icu import Locale, BreakIterator, RuleBasedBreakIterator
 from polyglot.base import Sequence
+from polyglot.decorators import memoize
+
+
+_FACTORIES = {
+  "sentence": BreakIterator.createSentenceInstance,
+  "word": BreakIterator.createWordInstance,
+}
+
+# Rule statuses below this limit mark segments that are neither words, numbers
+# nor ideographs, i.e. whitespace and punctuation.
+UBRK_WORD_NONE_LIMIT = 100
+
+_prototypes = {}
+_prototypes_lock = threading.Lock()
+_pool = threading.local()
+
+
+def _prototype(kind, locale):
+  """Return the shared prototype break iterator of `kind` for `locale`."""
+  key = (kind, locale.getName())
+  with _prototypes_lock:
+    if key not in _prototypes:
+      _prototypes[key] = _FACTORIES[kind](locale)
+    return _prototypes[key]
+
+
+def compile_break_iterators(locale):
+  """Build the shared prototypes of every kind of break iterator for `locale`.
+
+  Compiling the break rules of a locale is the expensive step; the iterators
+  of every thread are cheap copies of these prototypes.
+  """
+  locale = Locale(locale)
+  for kind in _FACTORIES:
+    _prototype(kind, locale)
+
+
+def get_break_iterator(kind, locale):
+  """Return a break iterator of `kind` for `locale` owned by this thread.
+
+  ICU break iterators keep the text they iterate over, so they can not be
+  shared across threads. Each thread keeps a pool of iterators keyed by
+  `kind` and locale, cloned from the compiled rules of a shared prototype.
+
+  Args:
+    kind (string): sentence or word.
+    locale (Locale): ICU locale of the iterator.
+  """
+  breakers = getattr(_pool, "breakers", None)
+  if breakers is None:
+    breakers = _pool.breakers = {}
+  key = (kind, locale.getName())
+  if key not in breakers:
+    rules = _prototype(kind, locale).getBinaryRules()
+    breakers[key] = RuleBasedBreakIterator(rules)
+  return breakers[key]
 
 
 class Breaker(object):
   """ Base class to segment text."""
 
+  kind = None
+
   def __init__(self, locale):
-    self.locale = Locale('locale')
-    self.breaker = None
+    self.locale = Locale(locale)
+
+  @property
+  def breaker(self):
+    return get_break_iterator(self.kind, self.locale)
 
   def transform(self, sequence):
     seq = Sequence(sequence.text)
     seq.idx = [0]
+    breaker = self.breaker
     for segment in sequence:
       offset = seq.idx[-1]
-      self.breaker.setText(segment)
-      seq.idx.extend([offset+x for x in self.breaker])
+      breaker.setText(segment)
+      seq.idx.extend([offset+x for x in breaker])
     return seq
 
+  def boundaries(self, text, statuses=False):
+    """Segment `text` in bulk and return the boundaries as an array.
+
+    Args:
+      text (string): unicode text to be segmented.
+      statuses (boolean): return the ICU rule status of every segment, too.
+
+    Returns:
+      An int32 array of offsets starting with 0 and ending with the text
+      length. If `statuses` is set, a tuple of the offsets and an int32 array
+      holding the rule status of the segment that ends at each offset but the
+      first.
+    """
+    breaker = self.breaker
+    breaker.setText(text)
+    if not statuses:
+      idx = np.fromiter(breaker, dtype=np.int32)
+      return np.concatenate((np.zeros(1, dtype=np.int32), idx))
+    idx = [0]
+    status = []
+    while True:
+      boundary = breaker.nextBoundary()
+      if boundary == BreakIterator.DONE:
+        break
+      idx.append(boundary)
+      status.append(breaker.getRuleStatus())
+    return np.array(idx, dtype=np.int32), np.array(status, dtype=np.int32)
+
  
 class SentenceTokenizer(Breaker):
   """ Segment text to sentences. """
 
+  kind = "sentence"
+
   def __init__(self, locale='en'):
     super(SentenceTokenizer, self).__init__(locale)
-    self.breaker = BreakIterator.createSentenceInstance(self.locale)
 
 
 class WordTokenizer(Breaker):
   """ Segment text to words or tokens."""
 
+  kind = "word"
+
   def __init__(self, locale='en'):
     super(WordTokenizer, self).__init__(locale)
-    self.breaker = BreakIterator.createWordInstance(self.locale)
+
+  def spans(self, text, punctuation=True):
+    """Return the start and end offsets of the tokens of `text`.
+
+    Whitespace segments are dropped using the rule statuses, so no token
+    string is created unless its status is ambiguous.
+
+    Args:
+      text (string): unicode text to be tokenized.
+      punctuation (boolean): keep punctuation and symbol tokens.
+
+    Returns:
+      A tuple of two int32 arrays, the starts and ends of the tokens.
+    """
+    idx, status = self.boundaries(text, statuses=True)
+    starts, ends = idx[:-1], idx[1:]
+    keep = status >= UBRK_WORD_NONE_LIMIT
+    if punctuation:
+      for i in np.flatnonzero(~keep):
+        keep[i] = not text[starts[i]:ends[i]].isspace()
+    return starts[keep], ends[keep]
+
+
+@memoize
+def get_sentence_tokenizer(locale='en'):
+  """Return a sentence tokenizer from the tokenizers cache."""
+  return SentenceTokenizer(locale=locale)
+
+
+@memoize
+def get_word_tokenizer(locale='en'):
+  """Return a word tokenizer from the tokenizers cache."""
+  return WordTokenizer(locale=locale)
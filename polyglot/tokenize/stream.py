@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Streaming segmentation of large documents."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from polyglot.base import Sequence
+from .base import get_sentence_tokenizer, get_word_tokenizer
+
+
+def _segment_records(job):
+  """Segment a list of complete records.
+
+  Note:
+    This is a helper function for parallel execution of
+    `StreamSegmenter.transform`.
+  """
+  config, records = job
+  segmenter = StreamSegmenter(**config)
+  lines = []
+  for record in records:
+    if record.endswith(segmenter.delimiter):
+      record = record[:-len(segmenter.delimiter)]
+    lines.extend(segmenter.segment(record)[0])
+  return u"\n".join(lines)
+
+
+class StreamSegmenter(object):
+  """Segment a text stream into sentences and words in large blocks.
+
+  The stream is split into records by `delimiter`. Sentences never cross a
+  record boundary, while line breaks inside a record are treated as spaces.
+  Records longer than a block are segmented as they arrive, holding back the
+  unfinished last sentence until the next block is read.
+
+  Args:
+    locale (string): language code of the text.
+    delimiter (string): separator of the records of the stream.
+    sentences (boolean): segment records into sentences.
+    words (boolean): segment records into words.
+    block_size (integer): number of characters read from the stream at once.
+  """
+
+  def __init__(self, locale='en', delimiter=u'\n', sentences=True, words=True,
+               block_size=1 << 20):
+    if not (sentences or words):
+      raise ValueError("Either sentences or words should be segmented.")
+    self.locale = locale
+    self.delimiter = delimiter
+    self.sentences = sentences
+    self.words = words
+    self.block_size = block_size
+    self.sent_tokenizer = get_sentence_tokenizer(locale=locale)
+    self.word_tokenizer = get_word_tokenizer(locale=locale)
+
+  @property
+  def config(self):
+    return {"locale": self.locale, "delimiter": self.delimiter,
+            "sentences": self.sentences, "words": self.words,
+            "block_size": self.block_size}
+
+  def segment(self, text, final=True):
+    """Segment `text` into output lines.
+
+    Args:
+      text (string): text of a record or of the beginning of a record.
+      final (boolean): whether `text` ends its record. If not, the last
+                       sentence is held back because it may be unfinished.
+
+    Returns:
+      A tuple of the output lines and the held back text.
+    """
+    if not text.strip():
+      return [], text if not final else u''
+    normalized = text.replace(u'\r', u' ').replace(u'\n', u' ')
+    breaker = self.sent_tokenizer if self.sentences else self.word_tokenizer
+    idx = breaker.boundaries(normalized)
+    if not final:
+      # A partial delimiter may end the text, do not cut before it.
+      limit = len(text) - len(self.delimiter) + 1
+      idx = idx[(idx < len(text)) & (idx <= limit)]
+    cut = int(idx[-1]) if len(idx) else 0
+    if cut == 0:
+      return [], text
+    seq = Sequence(normalized[:cut])
+    seq.idx = idx.tolist()
+    if self.sentences and self.words:
+      words = self.word_tokenizer.transform(Sequence(seq.text))
+      lines = [u' '.join(s.tokens()) for s in words.split(seq) if not s.empty()]
+    else:
+      lines = seq.tokens()
+    return lines, text[cut:]
+
+  def transform(self, textfile, workers=1, job_size=10000):
+    """Yield the output of segmenting `textfile`, a block at a time.
+
+    Args:
+      textfile (TextFile): stream to be segmented.
+      workers (integer): number of parallel processes. The records are
+                         sharded across processes in jobs of `job_size`.
+      job_size (integer): number of records sent to each process at once.
+    """
+    if workers > 1:
+      jobs = ((self.config, records)
+              for records in textfile.iter_chunks(job_size))
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+        for output in executor.map(_segment_records, jobs):
+          if output:
+            yield output
+      return
+
+    carry = u''
+    while True:
+      block = textfile.read(self.block_size)
+      text = carry + block
+      records = text.split(self.delimiter)
+      carry = records.pop() if block else u''
+      lines = []
+      for record in records:
+        lines.extend(self.segment(record)[0])
+      if not block:
+        if lines:
+          yield u"\n".join(lines)
+        break
+      head, carry = self.segment(carry, final=False)
+      lines.extend(head)
+      if lines:
+        yield u"\n".join(lines)
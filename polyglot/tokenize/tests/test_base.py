@@ -3,8 +3,14 @@
 
 """ Test basic tokenization utilities."""
 
+import threading
 import unittest
-from ..base import SentenceTokenizer, WordTokenizer
+
+import numpy as np
+
+from ..base import (SentenceTokenizer, WordTokenizer,
+                    get_sentence_tokenizer, get_word_tokenizer,
+                    compile_break_iterators, _prototypes)
 from ...base import Sequence
 
 en_text = u"""A Ukrainian separatist leader is calling on Russia to "absorb" the eastern region of Donetsk after Sunday's referendum on self rule. Self-declared Donetsk People's Republic leader Denis Pushilin urged Moscow to listen to the "will of the people". In neighbouring Luhansk, where a vote was also held, rebels declared independence. Ukraine, the EU and US have declared the referendums illegal but Russia says the results should be "implemented". Moscow has so far not commented on the call for Donetsk to become part of Russia but has appealed for dialogue between the militants and Kiev, with the participation of the Organisation for Security and Co-operation in Europe.
@@ -81,6 +87,99 @@ class BaseTest(unittest.TestCase):
     idx2 = self.ja_word.transform(self.ja_sents).idx
     self.assertListEqual(idx1, idx2)
 
+  def test_bulk_boundaries(self):
+    """ Bulk boundaries match the boundaries of `transform`."""
+
+    idx = self.en_word.boundaries(en_text)
+    self.assertEqual(idx.dtype, np.int32)
+    self.assertListEqual(idx.tolist(), self.en_words.idx)
+
+    idx, status = self.ar_word.boundaries(ar_text, statuses=True)
+    self.assertListEqual(idx.tolist(), self.ar_words.idx)
+    self.assertEqual(len(status), len(self.ar_words))
+
+  def test_spans(self):
+    """ Token spans match the stripped tokens."""
+
+    starts, ends = self.en_word.spans(en_text)
+    tokens = [en_text[s:e] for s, e in zip(starts, ends)]
+    self.assertListEqual(tokens, self.en_words.tokens())
+
+    starts, ends = self.en_word.spans(u"Hello, world 12!", punctuation=False)
+    self.assertListEqual(starts.tolist(), [0, 7, 13])
+    self.assertListEqual(ends.tolist(), [5, 12, 15])
+
+  def test_split(self):
+    """ Splitting words by sentences keeps every token."""
+
+    for words, sents in [(self.en_words, self.en_sents),
+                         (self.ar_words, self.ar_sents),
+                         (self.ja_words, self.ja_sents)]:
+      subsequences = list(words.split(sents))
+      self.assertEqual(len(subsequences), len(sents))
+      tokens = [t for s in subsequences for t in s.tokens()]
+      self.assertListEqual(tokens, words.tokens())
+      texts = [s.text for s in subsequences]
+      self.assertEqual(u"".join(texts), words.text)
+
+  def test_split_unaligned(self):
+    """ Splitting at a position that is not a boundary fails."""
+
+    seq = Sequence(en_text)
+    seq.idx = [0, 3, len(en_text)]
+    with self.assertRaises(ValueError):
+      list(self.en_words.split(seq))
+
+  def test_locale(self):
+    """ Tokenizers are built for the requested locale."""
+
+    self.assertEqual(self.ja_word.locale.getName(), u'ja')
+    self.assertEqual(self.ar_sent.locale.getName(), u'ar')
+
+  def test_cached_tokenizers(self):
+    """ Tokenizer factories return one instance per locale."""
+
+    self.assertIs(get_word_tokenizer('ja'), get_word_tokenizer('ja'))
+    self.assertIsNot(get_word_tokenizer('ja'), get_word_tokenizer('ar'))
+    self.assertIs(get_sentence_tokenizer(locale='ar'),
+                  get_sentence_tokenizer(locale='ar'))
+
+
+class BreakIteratorPoolTest(unittest.TestCase):
+  def test_shared_within_thread(self):
+    """ Tokenizers of the same locale reuse the thread's break iterator."""
+
+    self.assertIs(WordTokenizer(locale='en').breaker,
+                  WordTokenizer(locale='en').breaker)
+    self.assertIsNot(WordTokenizer(locale='en').breaker,
+                     SentenceTokenizer(locale='en').breaker)
+
+  def test_private_across_threads(self):
+    """ Each thread owns a separate break iterator."""
+
+    breakers = []
+    thread = threading.Thread(
+      target=lambda: breakers.append(WordTokenizer(locale='en').breaker))
+    thread.start()
+    thread.join()
+    self.assertIsNot(breakers[0], WordTokenizer(locale='en').breaker)
+
+  def test_compiled_prototypes(self):
+    """ Compiled prototypes are shared by the iterators of all threads."""
+
+    compile_break_iterators('fr')
+    self.assertIn(('word', 'fr'), _prototypes)
+    self.assertIn(('sentence', 'fr'), _prototypes)
+
+  def test_pooled_output(self):
+    """ Pooled iterators segment like freshly built ones."""
+
+    seq = Sequence(en_text)
+    idx1 = WordTokenizer(locale='en').transform(seq).idx
+    idx2 = WordTokenizer(locale='en').transform(seq).idx
+    self.assertListEqual(idx1, idx2)
+    self.assertEqual(5, len(SentenceTokenizer(locale='en').transform(seq)))
+
 
 if __name__ == "__main__":
   unittest.main()
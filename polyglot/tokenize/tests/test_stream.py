@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Test streaming segmentation."""
+
+import unittest
+from io import StringIO
+
+from ..stream import StreamSegmenter
+from .test_base import en_text
+
+
+text = u"""First record has two sentences. This one spans
+two lines.
+Second record.
+
+Third, after an empty record.
+"""
+
+
+def run(segmenter, text):
+  return u"\n".join(segmenter.transform(StringIO(text))).split(u"\n")
+
+
+class StreamSegmenterTest(unittest.TestCase):
+  def test_records(self):
+    """ Sentences do not cross records."""
+
+    segmenter = StreamSegmenter(locale='en')
+    lines = run(segmenter, text)
+    self.assertEqual(lines[0], u"First record has two sentences .")
+    self.assertEqual(lines[1], u"This one spans")
+    self.assertEqual(len(lines), 5)
+
+  def test_paragraph_records(self):
+    """ Sentences span lines inside a record."""
+
+    segmenter = StreamSegmenter(locale='en', delimiter=u'\n\n')
+    lines = run(segmenter, text)
+    self.assertEqual(lines[1], u"This one spans two lines .")
+    self.assertEqual(len(lines), 4)
+
+  def test_block_sizes(self):
+    """ The output does not depend on the size of the blocks."""
+
+    for delimiter in [u'\n', u'\n\n', u'. ']:
+      expected = run(StreamSegmenter(locale='en', delimiter=delimiter),
+                     en_text + text)
+      for block_size in [1, 2, 7, 64]:
+        segmenter = StreamSegmenter(locale='en', delimiter=delimiter,
+                                    block_size=block_size)
+        self.assertListEqual(run(segmenter, en_text + text), expected)
+
+  def test_modes(self):
+    """ Sentences or words are segmented on their own."""
+
+    sents = run(StreamSegmenter(locale='en', words=False), en_text)
+    self.assertEqual(len(sents), 5)
+    words = run(StreamSegmenter(locale='en', sentences=False), en_text)
+    self.assertEqual(words[:3], [u"A", u"Ukrainian", u"separatist"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,3 +1,3 @@
-from .base import Transliterator
+from .base import Transliterator, get_transliterator
 
-__all__ = ["Transliterator"]
+__all__ = ["Transliterator", "get_transliterator"]
@@ -7,51 +7,61 @@ Transliteration across pair of languages.
 
 """
 
-from math import log
+from collections import OrderedDict
 
-from ..load import load_transliteration_table
+from ..load import load_transliteration_model, model_cache
 from ..decorators import cached_property
+from ..utils import LRUCache
+from .compiled import TransliterationTrie, index_table
 
 
 class Transliterator(object):
   """Transliterator between pair of languages. """
 
-  def __init__(self, source_lang="en", target_lang="en"):
+  def __init__(self, source_lang="en", target_lang="en", memo_size=100000):
     """
     Args:
       source_lang (string): language code of the input langauge.
       target_lang (string): language code of the generated output langauge.
+      memo_size (integer): number of transliterated words to be remembered.
     """
     self.source_lang = source_lang
     self.target_lang = target_lang
+    self.memo = LRUCache(maxsize=memo_size)
 
-    self.decoder = self._decoder()
+    self.decode_many = self._decoder()
+    """Transliterate strings from English to the target language."""
+    self.encode_many = self._encoder()
+    """Transliterate strings from the input language to English."""
+
+  def decoder(self, word):
     """Transliterate a string from English to the target language."""
-    self.encoder = self._encoder()
+    return self.decode_many([word])[0]
+
+  def encoder(self, word):
     """Transliterate a string from the input language to English."""
+    return self.encode_many([word])[0]
 
   def _decoder(self):
-    """Transliterate a string from English to the target language."""
+    """Transliterate strings from English to the target language."""
     if self.target_lang == 'en':
       return Transliterator._dummy_coder
     else:
-      weights = load_transliteration_table(self.target_lang)
-      decoder_weights = weights["decoder"]
-      return Transliterator._transliterate_string(decoder_weights)
+      model = load_transliteration_model(self.target_lang)
+      return Transliterator._transliterate_strings(model["decoder"])
 
   def _encoder(self):
-    """Transliterate a string from the input language to English."""
+    """Transliterate strings from the input language to English."""
     if self.source_lang == 'en':
       return Transliterator._dummy_coder
     else:
-      weights = load_transliteration_table(self.source_lang)
-      encoder_weights = weights["encoder"]
-      return Transliterator._transliterate_string(encoder_weights)
+      model = load_transliteration_model(self.source_lang)
+      return Transliterator._transliterate_strings(model["encoder"])
 
   @staticmethod
-  def _dummy_coder(word):
-    """Returns the string as it is, no transliteration is done."""
-    return  word
+  def _dummy_coder(words):
+    """Returns the strings as they are, no transliteration is done."""
+    return list(words)
 
   def transliterate(self, word):
     """Transliterate the word from its source language to the target one.
@@ -59,48 +69,114 @@ class Transliterator(object):
     The method works by encoding the word into English then decoding the new
     Enlgish word to the target language.
     """
-    encoded_word = self.encoder(word)
-    decoded_word = self.decoder(encoded_word)
+    decoded_word = self.memo.get(word)
+    if decoded_word is None:
+      encoded_word = self.encoder(word)
+      decoded_word = self.decoder(encoded_word)
+      self.memo[word] = decoded_word
     return decoded_word
 
+  def transliterate_many(self, words):
+    """Transliterate a sequence of words, computing every distinct word once.
+
+    The words missing from the memo are transliterated together, so a
+    compiled model searches all of them with the same array operations.
+
+    Args:
+      words (list): strings in the source language.
+
+    Returns:
+      list of the transliterated words in the same order.
+    """
+    words = list(words)
+    results = {}
+    missing = []
+    for word in OrderedDict.fromkeys(words):
+      decoded_word = self.memo.get(word)
+      if decoded_word is None:
+        missing.append(word)
+      else:
+        results[word] = decoded_word
+    if missing:
+      decoded_words = self.decode_many(self.encode_many(missing))
+      for word, decoded_word in zip(missing, decoded_words):
+        self.memo[word] = decoded_word
+        results[word] = decoded_word
+    return [results[w] for w in words]
+
+  @staticmethod
+  def _compile_table(weight):
+    """Index the transliteration rules by their source piece."""
+    return index_table(weight)
+
   @staticmethod
   def _transliterate_string(weight, ngram1=6, ngram2=6):
-    def translate_string(word):
-      unlimited5 = 99999
+    translate_strings = Transliterator._transliterate_strings(weight, ngram1,
+                                                              ngram2)
+    return lambda word: translate_strings([word])[0]
+
+  @staticmethod
+  def _transliterate_strings(weight, ngram1=6, ngram2=6):
+    if isinstance(weight, TransliterationTrie):
+      # Compiled tries are searched as they are mapped.
+      matches = lambda words: weight.matches(words, ngram1)
+    else:
+      index = Transliterator._compile_table(weight)
+      if index:
+        ngram1 = min(ngram1, max(len(piece) for piece in index))
+
+      def matches(words):
+        return [word_matches(word) for word in words]
+
+      def word_matches(word):
+        rules = []
+        for start in range(len(word)):
+          rules.append([])
+          for end in range(start+1, min(len(word), start+ngram1)+1):
+            rule = index.get(word[start:end])
+            if rule is not None:
+              rules[start].append((end, rule[0], rule[1]))
+        return rules
+
+    def translate_strings(words):
       # Convert input to lower case
-      word = word.lower().strip()
+      words = [word.lower().strip() for word in words]
+      return [translate_string(word, rules)
+              for word, rules in zip(words, matches(words))]
+
+    def translate_string(word, rules):
+      unlimited5 = 99999
       # Initialize bestk results
-      best_source_string = []
-      best_target_string = []
-      best_string_cost = []
-      for i in range(len(word)+1):
-        best_source_string.append('')
-        best_target_string.append('')
-        best_string_cost.append(unlimited5)
+      best_target_string = [''] * (len(word)+1)
+      best_string_cost = [unlimited5] * (len(word)+1)
       # Only 1 initial state
       best_string_cost[0] = 0
-      # Start DP to generate bestk results
-      for i in range(1, len(word)+1):
-        for j in range(1, ngram1+1):
-          if i >= j:
-            piece = word[i-j:i]
-            for item in weight:
-              if item[0].strip() == piece:
-                vfinal = -log(weight[item])
-                if best_string_cost[i - j] < unlimited5:
-                  tmp_string_cost = best_string_cost[i - j]
-                  # Final cost value.
-                  # Things need to be considered:
-                  # 1) Individual cost of tranliterating from piece to tar
-                  # 2) Length of piece and tar
-                  # 3) Prefix of piece
-                  # 4) Prefix of tar
-                  tmp_string_cost += vfinal
-                  if tmp_string_cost < best_string_cost[i]:
-                    tmp_source_string = best_source_string[i - j] + piece
-                    tmp_target_string = best_target_string[i - j] + item[1].strip()
-                    best_source_string[i] = tmp_source_string
-                    best_target_string[i] = tmp_target_string
-                    best_string_cost[i] = tmp_string_cost
+      # Start DP to generate bestk results, extending every reachable prefix
+      # by the pieces that follow it. On equal costs the piece that starts
+      # last wins.
+      for i in range(len(word)):
+        if best_string_cost[i] >= unlimited5:
+          continue
+        for j, target, vfinal in rules[i]:
+          # Final cost value.
+          # Things need to be considered:
+          # 1) Individual cost of tranliterating from piece to tar
+          # 2) Length of piece and tar
+          # 3) Prefix of piece
+          # 4) Prefix of tar
+          tmp_string_cost = best_string_cost[i] + vfinal
+          if tmp_string_cost <= best_string_cost[j]:
+            best_target_string[j] = best_target_string[i] + target
+            best_string_cost[j] = tmp_string_cost
       return best_target_string[len(word)]
-    return translate_string
+    return translate_strings
+
+
+@model_cache.cached(lang=("source_lang", "target_lang"))
+def get_transliterator(source_lang="en", target_lang="en"):
+  """Return a transliterator from the models cache.
+
+  A transliterator holds the rule indexes of both languages, so it is
+  accounted for and evicted along with the loaded models.
+  """
+  return Transliterator(source_lang=source_lang, target_lang=target_lang)
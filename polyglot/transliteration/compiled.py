@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compiled transliteration tables.
+
+A compiled table is a trie of the source pieces stored as flat arrays, so it
+can be written once and memory mapped by every process that needs it.
+"""
+
+from math import log
+from os import path
+import os
+
+import numpy as np
+
+from ..utils import _replace
+
+CHARS = np.dtype('<u4')
+FIELDS = ["edge_keys", "children", "costs", "output_offsets", "output_chars"]
+
+LABEL_BITS = 21
+"""Number of bits of the code point in the key of an edge."""
+
+
+def index_table(weight):
+  """Index the transliteration rules by their source piece.
+
+  Only the cheapest rule of a source piece can win the transliteration
+  search, so the index keeps that rule with its precomputed cost.
+
+  Args:
+    weight (dict): mapping of (source, target) pairs to probabilities.
+
+  Returns:
+    dictionary of source piece -> (target, cost).
+  """
+  index = {}
+  for item in weight:
+    if weight[item] <= 0:
+      continue
+    piece = item[0].strip()
+    cost = -log(weight[item])
+    if piece not in index or cost < index[piece][1]:
+      index[piece] = (item[1].strip(), cost)
+  return index
+
+
+class TransliterationTrie(object):
+  """Trie of source pieces with the cheapest rule of every piece.
+
+  Every array can be memory mapped, the trie is searched without building
+  any other structure out of them.
+
+  Attributes:
+    edge_keys (array): sorted keys of the edges, the parent node shifted by
+                       `LABEL_BITS` bits or'ed with the code point of the
+                       edge label.
+    children (array): node reached by each edge.
+    costs (array): cost of the rule ending at each node, inf if none.
+    output_offsets (array): the target of node `n` is stored in
+                            `output_chars[output_offsets[n]:output_offsets[n+1]]`.
+    output_chars (array): code points of the concatenated targets.
+  """
+
+  def __init__(self, edge_keys, children, costs, output_offsets,
+               output_chars):
+    self.edge_keys = edge_keys
+    self.children = children
+    self.costs = costs
+    self.output_offsets = output_offsets
+    self.output_chars = output_chars
+
+  @classmethod
+  def from_index(cls, index):
+    """Build a trie out of a source piece -> (target, cost) dictionary."""
+    nodes = [{}]
+    rules = [None]
+    for piece in sorted(index):
+      node = 0
+      for ch in piece:
+        if ch not in nodes[node]:
+          nodes[node][ch] = len(nodes)
+          nodes.append({})
+          rules.append(None)
+        node = nodes[node][ch]
+      rules[node] = index[piece]
+
+    # Parents are visited in order and their labels sorted, so the keys are
+    # sorted too.
+    edge_keys, children = [], []
+    for parent, edges in enumerate(nodes):
+      for ch in sorted(edges):
+        edge_keys.append((parent << LABEL_BITS) | ord(ch))
+        children.append(edges[ch])
+
+    costs = [np.inf if rule is None else rule[1] for rule in rules]
+    targets = [u"" if rule is None else rule[0] for rule in rules]
+    output_offsets = np.cumsum([0] + [len(t) for t in targets])
+    output_chars = [ord(ch) for t in targets for ch in t]
+
+    return cls(edge_keys=np.array(edge_keys, dtype=np.int64),
+               children=np.array(children, dtype=np.int64),
+               costs=np.array(costs, dtype=np.float64),
+               output_offsets=output_offsets.astype(np.int64),
+               output_chars=np.array(output_chars, dtype=CHARS))
+
+  @classmethod
+  def load(cls, dirname, prefix, mmap_mode='r'):
+    """Load a trie saved by `save`, memory mapping its arrays."""
+    arrays = {f: np.load(path.join(dirname, "{}.{}.npy".format(prefix, f)),
+                         mmap_mode=mmap_mode)
+              for f in FIELDS}
+    return cls(**arrays)
+
+  @staticmethod
+  def saved_time(dirname, prefix):
+    """Return the time the trie saved under `prefix` was last written."""
+    return min(path.getmtime(path.join(dirname, "{}.{}.npy".format(prefix, f)))
+               for f in FIELDS)
+
+  def save(self, dirname, prefix):
+    """Save the arrays of the trie into `dirname`.
+
+    Every array is written to a temporary file first and then renamed, so
+    concurrent readers never map a partially written array.
+    """
+    if not path.isdir(dirname):
+      os.makedirs(dirname)
+    for f in FIELDS:
+      fname = path.join(dirname, "{}.{}.npy".format(prefix, f))
+      tmp = "{}.{}.tmp".format(fname, os.getpid())
+      try:
+        with open(tmp, "wb") as fh:
+          np.save(fh, getattr(self, f))
+        _replace(tmp, fname)
+      finally:
+        if path.exists(tmp):
+          os.remove(tmp)
+
+  def _edges(self, nodes, codes):
+    """Return the children of `nodes` along `codes` and where they exist."""
+    keys = (nodes << LABEL_BITS) | codes
+    edges = self.edge_keys.searchsorted(keys)
+    found = edges < len(self.edge_keys)
+    found[found] = self.edge_keys[edges[found]] == keys[found]
+    return self.children[edges[found]], found
+
+  def target(self, node):
+    """Return the target string of the rule ending at `node`."""
+    start, end = self.output_offsets[node], self.output_offsets[node+1]
+    return self.output_chars[start:end].tobytes().decode("utf-32-le")
+
+  def prefixes(self, word, start, max_len):
+    """Yield the rules whose source piece starts `word[start:]`.
+
+    Args:
+      word (string): word to be transliterated.
+      start (integer): position of the first character of the pieces.
+      max_len (integer): longest piece to be considered.
+
+    Returns:
+      Generator of (end, target, cost) tuples, shortest piece first.
+    """
+    node = np.zeros(1, dtype=np.int64)
+    for end in range(start, min(len(word), start + max_len)):
+      node, found = self._edges(node, np.array([ord(word[end])]))
+      if not found[0]:
+        return
+      cost = float(self.costs[node[0]])
+      if cost != np.inf:
+        yield end + 1, self.target(node[0]), cost
+
+  def matches(self, words, max_len):
+    """Return the rules whose source piece starts at every position of `words`.
+
+    All the positions of all the words are walked down the trie together, a
+    character per step, so the array operations are shared by the words.
+
+    Args:
+      words (list): words to be transliterated.
+      max_len (integer): longest piece to be considered.
+
+    Returns:
+      A list with, for every word, a list with a list of (end, target, cost)
+      tuples for every position of the word, shortest piece first.
+    """
+    sizes = [len(w) for w in words]
+    total = sum(sizes)
+    # Words are separated by code points of -1, which match no edge.
+    begins = np.cumsum([0] + sizes[:-1]) + np.arange(len(words))
+    codes = np.full(total + len(words) + max_len, -1, dtype=np.int64)
+    starts = np.arange(total) + np.repeat(np.arange(len(words)), sizes)
+    codes[starts] = np.frombuffer(u"".join(words).encode("utf-32-le"),
+                                  dtype=CHARS)
+    nodes = np.zeros(total, dtype=np.int64)
+    matched = []
+    for depth in range(1, min(max_len, max(sizes or [0])) + 1):
+      nodes, found = self._edges(nodes, codes[starts + depth - 1])
+      starts = starts[found]
+      if not len(starts):
+        break
+      rules = self.costs[nodes] != np.inf
+      matched.append((starts[rules], nodes[rules], depth))
+
+    rules = [[[] for _ in range(size)] for size in sizes]
+    if not matched:
+      return rules
+    starts = np.concatenate([m[0] for m in matched])
+    nodes = np.concatenate([m[1] for m in matched])
+    lengths = np.repeat([m[2] for m in matched], [len(m[0]) for m in matched])
+    word_ids = begins.searchsorted(starts, side="right") - 1
+    starts -= begins[word_ids]
+    # Gather the targets of all the rules with a single index.
+    first = self.output_offsets[nodes]
+    target_sizes = self.output_offsets[nodes + 1] - first
+    ends = np.cumsum(target_sizes)
+    chars = (np.repeat(first - (ends - target_sizes), target_sizes) +
+             np.arange(ends[-1]))
+    output = self.output_chars[chars].tobytes().decode("utf-32-le")
+    for word_id, start, length, cost, end, size in zip(
+        word_ids.tolist(), starts.tolist(), lengths.tolist(),
+        self.costs[nodes].tolist(), ends.tolist(), target_sizes.tolist()):
+      rules[word_id][start].append((start + length, output[end - size:end],
+                                    cost))
+    return rules
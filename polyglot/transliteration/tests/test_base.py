@@ -3,12 +3,86 @@
 
 """Test basic Transliterators facilities."""
 
+import shutil
+import tempfile
 import unittest
-from .. import Transliterator
+from .. import Transliterator, get_transliterator
+from ..compiled import TransliterationTrie, index_table
 
 class TransliteratorTest(unittest.TestCase):
-  def __init__(self):
-    pass
+  pass
+
+
+weights = {(u"a", u"x"): 0.5, (u"b", u"y"): 0.5, (u"ab", u"z"): 0.9,
+           (u"ab ", u"w "): 0.1, (u"c", u"q"): 0.0}
+
+
+class TransliterateStringTest(unittest.TestCase):
+  def setUp(self):
+    self.translate = Transliterator._transliterate_string(weights)
+
+  def test_compile_table(self):
+    index = Transliterator._compile_table(weights)
+    self.assertEqual(sorted(index), [u"a", u"ab", u"b"])
+    self.assertEqual(index[u"ab"][0], u"z")
+
+  def test_cheapest_segmentation(self):
+    self.assertEqual(self.translate(u"ab"), u"z")
+    self.assertEqual(self.translate(u"AAB"), u"xz")
+    self.assertEqual(self.translate(u"ba"), u"yx")
+
+  def test_unknown_piece(self):
+    self.assertEqual(self.translate(u"abc"), u"")
+
+
+class TransliterationTrieTest(unittest.TestCase):
+  def setUp(self):
+    self.trie = TransliterationTrie.from_index(index_table(weights))
+    self.dirname = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dirname)
+
+  def test_prefixes(self):
+    rules = list(self.trie.prefixes(u"aab", 1, 6))
+    self.assertEqual([(end, target) for end, target, _ in rules],
+                     [(2, u"x"), (3, u"z")])
+    self.assertEqual(list(self.trie.prefixes(u"abc", 2, 6)), [])
+
+  def test_matches(self):
+    rules = self.trie.matches([u"aab", u"", u"cc", u"ba"], 6)
+    self.assertEqual([[[(end, target) for end, target, _ in position]
+                       for position in word] for word in rules],
+                     [[[(1, u"x")], [(2, u"x"), (3, u"z")], [(3, u"y")]],
+                      [], [[], []], [[(1, u"y")], [(2, u"x")]]])
+    self.assertEqual(self.trie.matches([], 6), [])
+
+  def test_save_load(self):
+    self.trie.save(self.dirname, "decoder")
+    trie = TransliterationTrie.load(self.dirname, "decoder")
+    translate = Transliterator._transliterate_string(trie)
+    expected = Transliterator._transliterate_string(weights)
+    words = [u"ab", u"aab", u"ba", u"abc", u"bab"]
+    for word in words:
+      self.assertEqual(translate(word), expected(word))
+    translate_many = Transliterator._transliterate_strings(trie)
+    self.assertEqual(translate_many(words), [expected(w) for w in words])
+
+class TransliterateManyTest(unittest.TestCase):
+  def test_memo(self):
+    t = Transliterator(source_lang="en", target_lang="en", memo_size=2)
+    self.assertEqual(t.transliterate_many([u"a", u"b", u"a"]),
+                     [u"a", u"b", u"a"])
+    self.assertEqual(t.memo.misses, 2)
+    self.assertEqual(t.transliterate_many([u"b", u"a"]), [u"b", u"a"])
+    self.assertEqual(t.memo.hits, 2)
+    t.transliterate(u"c")
+    self.assertEqual(len(t.memo), 2)
+
+  def test_cached_transliterators(self):
+    self.assertIs(get_transliterator("en", "en"),
+                  get_transliterator("en", "en"))
+
 
 if __name__ == "__main__":
   unittest.main()
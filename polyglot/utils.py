@@ -4,20 +4,95 @@
 """Collection of general utilities."""
 
 from __future__ import print_function
+from collections import OrderedDict
+from contextlib import closing
 from os import path
+import io
+import json
+import logging
 import os
+import shutil
 import tarfile
+import threading
 
+import numpy as np
 import six
 from six import text_type as unicode
 from six import string_types
 
 
+logger = logging.getLogger(__name__)
+
+
+_replace = getattr(os, "replace", os.rename)
+
+
+def _extract(file_, root=None):
+  """Return the path of an uncompressed copy of the archive `file_`.
+
+  Archives under the polyglot data directory are extracted once into
+  `polyglot_data/extracted`. The size and modification time of the archive
+  and the size of the copy are recorded next to the copy, which is extracted
+  again if any of them changes.
+
+  Args:
+    file_ (string): path of a tar archive.
+    root (string): data directory, defaults to the polyglot data path.
+
+  Returns:
+    The path of the extracted file, or None if the archive is outside the
+    data directory or the copy can not be written.
+  """
+  if root is None:
+    from . import polyglot_path as root
+  root = path.abspath(root)
+  archive = path.abspath(file_)
+  if not archive.startswith(root + os.sep):
+    return None
+  name, _ = path.splitext(path.relpath(archive, root))
+  if name.endswith(".tar"):
+    name = name[:-len(".tar")]
+  target = path.join(root, "extracted", name)
+  stat = os.stat(archive)
+  stamp = u"{} {}".format(stat.st_size, stat.st_mtime)
+  try:
+    with io.open(target + ".source", encoding="utf-8") as fh:
+      recorded = fh.read().split(u"\n")
+    if recorded[0] == stamp and int(recorded[1]) == path.getsize(target):
+      return target
+  except (IOError, OSError, IndexError, ValueError):
+    pass
+
+  tmp = "{}.{}.tmp".format(target, os.getpid())
+  try:
+    if not path.isdir(path.dirname(target)):
+      os.makedirs(path.dirname(target))
+    with closing(tarfile.open(archive)) as s:
+      with open(tmp, "wb") as fh:
+        shutil.copyfileobj(s.extractfile(s.next()), fh)
+    _replace(tmp, target)
+    with io.open(target + ".source", "w", encoding="utf-8") as fh:
+      fh.write(u"{}\n{}".format(stamp, path.getsize(target)))
+  except (IOError, OSError, tarfile.TarError):
+    return None
+  finally:
+    if path.exists(tmp):
+      os.remove(tmp)
+  return target
+
+
 def _open(file_, mode='r'):
-  """Open file object given filenames, open files or even archives."""
+  """Open file object given filenames, open files or even archives.
+
+  Archives of the polyglot data directory are read from their extracted
+  copy, see `_extract`.
+  """
   if isinstance(file_, string_types):
     _, ext = path.splitext(file_)
     if ext in {'.bz2', '.gz'}:
+      extracted = _extract(file_)
+      if extracted is not None:
+        return open(extracted, 'rb')
       s = tarfile.open(file_)
       return s.extractfile(s.next())
     else:
@@ -84,3 +159,299 @@ def _decode(s, encoding="utf-8"):
     return s.encode("utf-8").decode(encoding)
   else:
     return s.decode(encoding)
+
+
+class LRUCache(object):
+  """A mapping of bounded size that evicts the least recently used keys.
+
+  Attributes:
+    maxsize (integer): maximum number of items, None for no bound.
+    hits (integer): number of lookups that found their key.
+    misses (integer): number of lookups that missed their key.
+  """
+
+  def __init__(self, maxsize=None):
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._data = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key, default=None):
+    """Return the value of `key` and mark it as recently used."""
+    with self._lock:
+      try:
+        value = self._data.pop(key)
+      except KeyError:
+        self.misses += 1
+        return default
+      self._data[key] = value
+      self.hits += 1
+      return value
+
+  def __setitem__(self, key, value):
+    with self._lock:
+      self._data.pop(key, None)
+      self._data[key] = value
+      while self.maxsize is not None and len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def __contains__(self, key):
+    return key in self._data
+
+  def __len__(self):
+    return len(self._data)
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+      self.hits = 0
+      self.misses = 0
+
+  @property
+  def hit_rate(self):
+    lookups = self.hits + self.misses
+    return float(self.hits) / lookups if lookups else 0.0
+
+  def stats(self):
+    """Return a dictionary of the cache size and hit statistics."""
+    return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits,
+            "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+def _resource_format(filename):
+  """Return the format of a resource file from its extension."""
+  name = path.basename(filename)
+  for compound in (".tar.bz2", ".tar.gz"):
+    if name.endswith(compound):
+      return compound[1:]
+  return path.splitext(name)[1][1:]
+
+
+class ResourceManifest(object):
+  """The installed resources of a data directory, keyed by package id.
+
+  The manifest is stored as `manifest.json` in the data directory and is
+  read once per process. Each entry records the file path relative to the
+  data directory, its size and its format, so resolving an installed
+  resource does not touch the filesystem.
+
+  Attributes:
+    root (string): data directory the manifest describes.
+  """
+
+  FILENAME = "manifest.json"
+
+  _instances = {}
+  _instances_lock = threading.Lock()
+
+  def __init__(self, root):
+    self.root = root
+    self._entries = None
+    self._lock = threading.RLock()
+
+  @classmethod
+  def for_root(cls, root):
+    """Return the manifest shared by all users of the data directory `root`."""
+    root = path.abspath(root)
+    with cls._instances_lock:
+      if root not in cls._instances:
+        cls._instances[root] = cls(root)
+      return cls._instances[root]
+
+  @property
+  def filename(self):
+    return path.join(self.root, self.FILENAME)
+
+  @property
+  def entries(self):
+    if self._entries is None:
+      with self._lock:
+        if self._entries is None:
+          self._entries = self._read()
+    return self._entries
+
+  def _read(self):
+    try:
+      with io.open(self.filename, encoding="utf-8") as fh:
+        entries = json.load(fh)
+    except (IOError, OSError, ValueError):
+      return {}
+    return entries if isinstance(entries, dict) else {}
+
+  def get(self, package_id):
+    """Return the entry of `package_id` or None if it is not recorded."""
+    return self.entries.get(package_id)
+
+  def locate(self, package_id):
+    """Return the absolute path of `package_id` or None if it is not recorded."""
+    entry = self.entries.get(package_id)
+    if entry is None:
+      return None
+    return path.join(self.root, entry["path"])
+
+  def add(self, package_id, filename, save=True):
+    """Record `filename` as the installed file of `package_id`.
+
+    Args:
+      package_id (string): package identifier such as `embeddings2.en`.
+      filename (string): path of the installed file.
+      save (bool): write the manifest to disk.
+    """
+    filename = path.abspath(filename)
+    entry = {"path": path.relpath(filename, self.root),
+             "size": os.path.getsize(filename),
+             "format": _resource_format(filename)}
+    with self._lock:
+      self.entries[package_id] = entry
+    if save:
+      self.save()
+    return entry
+
+  def discard(self, package_id, save=True):
+    """Forget `package_id`, e.g. before it is downloaded again."""
+    with self._lock:
+      found = self.entries.pop(package_id, None) is not None
+    if found and save:
+      self.save()
+
+  def clear(self):
+    """Drop the in-memory entries so they are read again from disk."""
+    with self._lock:
+      self._entries = None
+
+  def save(self):
+    """Write the manifest atomically. Returns False if it can not be written."""
+    with self._lock:
+      data = json.dumps(self.entries, indent=1, sort_keys=True)
+      tmp = "{}.{}.tmp".format(self.filename, os.getpid())
+      try:
+        with io.open(tmp, "w", encoding="utf-8") as fh:
+          fh.write(unicode(data))
+        _replace(tmp, self.filename)
+      except (IOError, OSError):
+        return False
+    return True
+
+
+def _mapped_file(array):
+  """Return the name of the file `array` is memory mapped from, if any."""
+  while isinstance(array, np.ndarray):
+    if isinstance(array, np.memmap) and array.filename:
+      return array.filename
+    array = array.base
+  return None
+
+
+class SharedArrays(object):
+  """A registry of large read-only arrays memory mapped from files.
+
+  A shared array is written once as a `.npy` file under `root` and mapped
+  read only. Its pages live in the page cache: processes forked after the
+  load use them without copying, and other processes attach to the same file
+  by name instead of loading their own copy.
+
+  Attributes:
+    root (string): directory of the array files.
+    enabled (bool): share arrays, otherwise `share` returns them unchanged.
+    min_size (integer): arrays smaller than this many bytes are not shared.
+  """
+
+  def __init__(self, root, enabled=False, min_size=1 << 16):
+    self.root = root
+    self.enabled = enabled
+    self.min_size = min_size
+    self._arrays = OrderedDict()
+    self._lock = threading.Lock()
+
+  def filename(self, name):
+    return path.join(self.root, name + ".npy")
+
+  def _fresh(self, fname, array, source):
+    """Whether `fname` holds `array` and is newer than `source`."""
+    try:
+      if source is not None and path.getmtime(fname) < path.getmtime(source):
+        return False
+      mapped = np.load(fname, mmap_mode="r")
+    except (IOError, OSError, ValueError):
+      return False
+    return mapped.shape == array.shape and mapped.dtype == array.dtype
+
+  def _write(self, fname, array):
+    if not path.isdir(path.dirname(fname)):
+      os.makedirs(path.dirname(fname))
+    tmp = "{}.{}.tmp".format(fname, os.getpid())
+    try:
+      with open(tmp, "wb") as fh:
+        np.save(fh, array)
+      _replace(tmp, fname)
+    finally:
+      if path.exists(tmp):
+        os.remove(tmp)
+
+  def share(self, name, array, source=None):
+    """Return a read-only memory mapped copy of `array` registered as `name`.
+
+    Args:
+      name (string): name of the array, e.g. `embeddings2/en/vectors`.
+      array (ndarray): array to be shared.
+      source (string): file the array was loaded from. An existing file of
+                       `name` older than `source` is written again.
+
+    Returns:
+      The mapped array, or `array` itself if sharing is disabled, the array
+      is small or holds objects, or its file can not be written.
+    """
+    if (not self.enabled or not isinstance(array, np.ndarray) or
+        array.nbytes < self.min_size or array.dtype.hasobject):
+      return array
+    if not array.flags.writeable and _mapped_file(array) is not None:
+      # Already mapped read only from a file other processes can map.
+      with self._lock:
+        self._arrays[name] = array
+      return array
+    fname = self.filename(name)
+    with self._lock:
+      try:
+        if not self._fresh(fname, array, source):
+          self._write(fname, array)
+        shared = np.load(fname, mmap_mode="r")
+      except (IOError, OSError) as e:
+        logger.warning("The array {} could not be shared through {}\n{}".format(
+                       name, fname, e))
+        return array
+      self._arrays[name] = shared
+    return shared
+
+  def share_all(self, name, obj, source=None):
+    """Share the arrays held by the dictionaries, lists and tuples of `obj`.
+
+    Returns:
+      a copy of the containers of `obj` holding the shared arrays.
+    """
+    if isinstance(obj, dict):
+      return type(obj)((k, self.share_all("{}/{}".format(name, k), v, source))
+                       for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+      return type(obj)(self.share_all("{}/{}".format(name, i), v, source)
+                       for i, v in enumerate(obj))
+    return self.share(name, obj, source=source)
+
+  def attach(self, name):
+    """Map the array another process shared as `name`."""
+    with self._lock:
+      if name not in self._arrays:
+        self._arrays[name] = np.load(self.filename(name), mmap_mode="r")
+      return self._arrays[name]
+
+  def registry(self):
+    """Return the shared arrays as a list of (name, filename, bytes) tuples."""
+    with self._lock:
+      return [(name, _mapped_file(array) or self.filename(name), array.nbytes)
+              for name, array in self._arrays.items()]
+
+  def __contains__(self, name):
+    return name in self._arrays
+
+  def __len__(self):
+    return len(self._arrays)
@@ -38,6 +38,7 @@ setup(
                 'polyglot.detect',
                 'polyglot.tokenize',
                 'polyglot.mapping',
+                'polyglot.morphology',
                 'polyglot.tag',
                 'polyglot.transliteration'],
     entry_points={